@@ -0,0 +1,361 @@
+import csv
+import io
+import json
+import os
+import sys
+
+"""
+    Constants
+"""
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+QUESTS_JSON_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "static", "Quests.json"
+)
+
+QUEST_PARAMS_COUNT = 24
+FILLER_ROWS_COUNT = 300
+COPY_NUMBER_OFFSET = 100000  # Quest numbers of scaled copies are shifted by this per copy
+LOCAL_ASSET_PREFIX = "assets/"  # As in quest_assets.py, images bundled by --assets
+
+"""
+    Recording
+
+    The fixtures mirror the layout of the ffxiv-datamining CSVs and the XIVAPI answers the
+    pipeline reads. They are derived from a Quests.json build, so they contain exactly the
+    data a real run needs:
+      fixtures/csv/en/Quest.csv, ExVersion.csv, InstanceContent.csv
+      fixtures/journals.csv                   Quest Id -> first journal line
+      fixtures/xivapi/ContentFinderCondition.json   row ID -> sheet row
+      fixtures/xivapi/QuestIcons.json         quest name -> icon path
+      fixtures/expected.json                  quest count of the build they were recorded from
+
+    Quests the build links to but left out, such as the quest every envoy quest leads to,
+    get stub rows: MSQ rows the linking stage drops for NextMSQ targets, side quests for
+    PreviousQuests. Images bundled by --assets are recorded with their XIVAPI path again,
+    taken from the previous fixtures or made up from the asset's file name.
+"""
+
+def get_quest_csv_header(extra_columns=0):
+    header = ["#", "Id", "Name", "Expansion", "EventIconType"]
+    header += [f"PreviousQuest[{i}]" for i in range(3)]
+    for i in range(QUEST_PARAMS_COUNT):
+        header += [f"QuestParams[{i}].ScriptInstruction", f"QuestParams[{i}].ScriptArg"]
+    header += [f"Unknown{i}" for i in range(extra_columns + 1)]
+    # The pipeline reads the penultimate column as the obsolete flag
+    header += ["IsObsolete", "Unknown"]
+    return header
+
+def empty_quest_row(header):
+    row = {column: "" for column in header}
+    for column in header:
+        if column.startswith(("PreviousQuest[", "Unknown")) or column.endswith(".ScriptArg"):
+            row[column] = 0
+    row["IsObsolete"] = "False"
+    return row
+
+def load_previous_image_paths(fixtures_dir):
+    # XIVAPI paths of the fixtures being replaced, by quest name and by unlock
+    icons = {}
+    unlock_images = {}
+    xivapi_dir = os.path.join(fixtures_dir, "xivapi")
+    if os.path.exists(os.path.join(xivapi_dir, "QuestIcons.json")):
+        with open(os.path.join(xivapi_dir, "QuestIcons.json")) as json_file:
+            icons = json.load(json_file)
+    if os.path.exists(os.path.join(xivapi_dir, "ContentFinderCondition.json")):
+        with open(os.path.join(xivapi_dir, "ContentFinderCondition.json")) as json_file:
+            for row in json.load(json_file).values():
+                fields = row["fields"]
+                key = (fields["Name"], fields["ContentType"]["fields"]["Name"])
+                unlock_images[key] = fields["Image"]["path_hr1"]
+    return icons, unlock_images
+
+def get_remote_image_path(image, previous_image):
+    # Bundled images get their XIVAPI path back, so the fixtures serve something to bundle
+    if not image or not image.startswith(LOCAL_ASSET_PREFIX):
+        return image
+    if previous_image and not previous_image.startswith(LOCAL_ASSET_PREFIX):
+        return previous_image
+    file_stem = os.path.splitext(image[len(LOCAL_ASSET_PREFIX) :])[0]
+    return f"ui/icon/assets/{file_stem}_hr1.tex"
+
+def get_stub_rows(header, quests, expansion_names):
+    # Rows for the quests the build links to but does not contain
+    quest_numbers = {quest["#"] for quest, _ in quests}
+    next_msq_sources = {}
+    previous_quests = set()
+    for quest, expansion_name in quests:
+        if quest["NextMSQ"] is not None and quest["NextMSQ"] not in quest_numbers:
+            next_msq_sources.setdefault(quest["NextMSQ"], []).append((quest, expansion_name))
+        previous_quests.update(set(quest["PreviousQuests"]) - quest_numbers)
+
+    stub_rows = []
+    for quest_number in sorted(set(next_msq_sources) | previous_quests):
+        row = empty_quest_row(header)
+        row.update(
+            {
+                "#": quest_number,
+                "Id": f"SubStb{quest_number % 1000:03d}_{quest_number % 100000:05d}",
+                "Name": f"Stub Quest {quest_number}",
+                "Expansion": 0,
+                "EventIconType": 1,
+            }
+        )
+        sources = next_msq_sources.get(quest_number)
+        if sources:
+            # An MSQ listing the quests that lead to it, without a NextMSQ of its own
+            row["Id"] = f"ManStb{quest_number % 1000:03d}_{quest_number % 100000:05d}"
+            row["EventIconType"] = 3
+            row["Expansion"] = expansion_names.index(sources[0][1])
+            for i, (quest, _) in enumerate(sources[:3]):
+                row[f"PreviousQuest[{i}]"] = quest["#"]
+        stub_rows.append(row)
+    return stub_rows
+
+def record_fixtures(quests_json_path=QUESTS_JSON_PATH, fixtures_dir=FIXTURES_DIR):
+    with open(quests_json_path) as json_file:
+        quests_array = json.load(json_file)
+
+    expansion_names = [expansion["name"] for expansion in quests_array]
+    previous_icons, previous_unlock_images = load_previous_image_paths(fixtures_dir)
+    header = get_quest_csv_header()
+    rows = []
+    instance_ids = {}
+    journals = {}
+    icons = {}
+    quests = [
+        (quest, expansion["name"])
+        for expansion in quests_array
+        for group_quests in expansion["quests"].values()
+        for quest in group_quests
+    ]
+
+    for quest, _ in quests:
+        row = empty_quest_row(header)
+        row["#"] = quest["#"]
+        row["Id"] = quest["Id"]
+        row["Name"] = quest["Name"]
+        row["Expansion"] = expansion_names.index(quest["ExpansionName"])
+        row["EventIconType"] = quest["EventIconType"]
+        for i, previous_quest in enumerate(quest["PreviousQuests"][:3]):
+            row[f"PreviousQuest[{i}]"] = previous_quest
+        # A few non-unlock instructions so the unlock filter has something to skip
+        for i in range(3):
+            row[f"QuestParams[{i}].ScriptInstruction"] = f"ACTOR{i}"
+            row[f"QuestParams[{i}].ScriptArg"] = 1000000 + i
+        for i, unlock in enumerate(quest["Unlocks"]):
+            image = get_remote_image_path(
+                unlock["Image"],
+                previous_unlock_images.get((unlock["Name"], unlock["ContentTypeName"])),
+            )
+            key = (unlock["Name"], image, unlock["ContentTypeName"])
+            instance_id = instance_ids.setdefault(key, len(instance_ids) + 1)
+            row[f"QuestParams[{5 + i}].ScriptInstruction"] = f"INSTANCEDUNGEON{i}"
+            row[f"QuestParams[{5 + i}].ScriptArg"] = instance_id
+        rows.append(row)
+
+        if quest["Description"] is not None:
+            journals[quest["Id"]] = quest["Description"]
+        icons.setdefault(
+            quest["Name"],
+            get_remote_image_path(quest["Image"], previous_icons.get(quest["Name"])),
+        )
+
+    rows += get_stub_rows(header, quests, expansion_names)
+
+    # Side quests and an obsolete MSQ, which the MSQ filters must drop
+    for i in range(FILLER_ROWS_COUNT):
+        row = empty_quest_row(header)
+        row.update(
+            {
+                "#": 90000 + i,
+                "Id": f"SubSea{i:03d}_{i + 1000:05d}",
+                "Name": f"Side Quest {i}",
+                "Expansion": i % len(expansion_names),
+                "EventIconType": 1,
+            }
+        )
+        rows.append(row)
+    obsolete_row = empty_quest_row(header)
+    obsolete_row.update(
+        {
+            "#": 89999,
+            "Id": "ManFst999_09999",
+            "Name": "Obsolete Quest",
+            "Expansion": 0,
+            "EventIconType": 3,
+            "IsObsolete": "True",
+        }
+    )
+    rows.append(obsolete_row)
+    rows.sort(key=lambda row: row["#"])
+
+    csv_dir = os.path.join(fixtures_dir, "csv", "en")
+    xivapi_dir = os.path.join(fixtures_dir, "xivapi")
+    os.makedirs(csv_dir, exist_ok=True)
+    os.makedirs(xivapi_dir, exist_ok=True)
+
+    with open(os.path.join(csv_dir, "Quest.csv"), "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, header)
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(os.path.join(csv_dir, "ExVersion.csv"), "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["#", "Name"])
+        writer.writerows(enumerate(expansion_names))
+    with open(os.path.join(csv_dir, "InstanceContent.csv"), "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["#", "InstanceContentType", "ContentFinderCondition"])
+        for instance_id in instance_ids.values():
+            writer.writerow([instance_id, 1, 2000 + instance_id])
+    with open(os.path.join(fixtures_dir, "journals.csv"), "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["Id", "Text"])
+        writer.writerows(sorted(journals.items()))
+
+    content_finder_conditions = {
+        str(2000 + instance_id): {
+            "fields": {
+                "Name": name,
+                "Image": {"path_hr1": image},
+                "ContentType": {"fields": {"Name": content_type_name}},
+            }
+        }
+        for (name, image, content_type_name), instance_id in instance_ids.items()
+    }
+    with open(os.path.join(xivapi_dir, "ContentFinderCondition.json"), "w") as json_file:
+        json.dump(content_finder_conditions, json_file, indent=1, ensure_ascii=False)
+    with open(os.path.join(xivapi_dir, "QuestIcons.json"), "w") as json_file:
+        json.dump(icons, json_file, indent=1, ensure_ascii=False)
+    with open(os.path.join(fixtures_dir, "expected.json"), "w") as json_file:
+        json.dump({"quests": len(quests)}, json_file, indent=1)
+
+"""
+    Loading and scaling
+"""
+
+class Dataset:
+    def __init__(self, csv_files, journals, content_finder_conditions, icons, expected_quests=None):
+        self.csv_files = csv_files  # File name under csv/en -> bytes
+        self.journals = journals
+        self.content_finder_conditions = content_finder_conditions
+        self.icons = icons
+        self.expected_quests = expected_quests  # Quests a build of the unscaled data must give
+
+    def journal_csv(self, quest_id):
+        text = self.journals.get(quest_id)
+        if text is None:
+            return None
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow([0, f"TEXT_{quest_id.upper()}_SEQ_00", text])
+        return output.getvalue().encode("utf-8")
+
+    def write_checkout(self, target_dir, locales=("en",)):
+        # Lays the dataset out like a checkout of ffxiv-datamining, for --datamining-dir
+        for locale in locales:
+            csv_dir = os.path.join(target_dir, "csv", locale)
+            for file_name, content in self.csv_files.items():
+                write_file(os.path.join(csv_dir, file_name), content)
+            for quest_id in self.journals:
+                folder = quest_id.rpartition("_")[2][:3]
+                write_file(
+                    os.path.join(csv_dir, "quest", folder, f"{quest_id}.csv"),
+                    self.journal_csv(quest_id),
+                )
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as output_file:
+        output_file.write(content)
+
+def read_csv_rows(path):
+    with open(path, newline="", encoding="utf-8") as csv_file:
+        return list(csv.DictReader(csv_file))
+
+def write_csv_rows(header, rows):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, header)
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue().encode("utf-8")
+
+def load_dataset(fixtures_dir=FIXTURES_DIR, scale=1, extra_rows=0, extra_columns=0):
+    # scale=N appends N-1 copies of every quest as new expansions with shifted quest numbers,
+    # extra_rows adds side quests and extra_columns adds unused columns to Quest.csv
+    csv_dir = os.path.join(fixtures_dir, "csv", "en")
+    quest_rows = read_csv_rows(os.path.join(csv_dir, "Quest.csv"))
+    expansion_rows = read_csv_rows(os.path.join(csv_dir, "ExVersion.csv"))
+    journals = {
+        row["Id"]: row["Text"]
+        for row in read_csv_rows(os.path.join(fixtures_dir, "journals.csv"))
+    }
+    with open(os.path.join(fixtures_dir, "xivapi", "ContentFinderCondition.json")) as json_file:
+        content_finder_conditions = json.load(json_file)
+    with open(os.path.join(fixtures_dir, "xivapi", "QuestIcons.json")) as json_file:
+        icons = json.load(json_file)
+    with open(os.path.join(fixtures_dir, "expected.json")) as json_file:
+        expected_quests = json.load(json_file)["quests"]
+
+    header = get_quest_csv_header(extra_columns)
+    expansion_count = len(expansion_rows)
+    msq_rows = [row for row in quest_rows if row["EventIconType"] == "3"]
+    scaled_rows = list(quest_rows)
+    for copy in range(1, scale):
+        offset = copy * COPY_NUMBER_OFFSET
+        for row in msq_rows:
+            copied_row = dict(row)
+            prefix, _, suffix = row["Id"].rpartition("_")
+            copied_row["#"] = int(row["#"]) + offset
+            copied_row["Id"] = f"{prefix}c{copy}_{suffix}"
+            copied_row["Name"] = f"{row['Name']} ({copy})"
+            copied_row["Expansion"] = int(row["Expansion"]) + copy * expansion_count
+            for i in range(3):
+                previous_quest = int(row[f"PreviousQuest[{i}]"] or 0)
+                copied_row[f"PreviousQuest[{i}]"] = previous_quest + offset if previous_quest else 0
+            scaled_rows.append(copied_row)
+
+            if row["Id"] in journals:
+                journals[copied_row["Id"]] = journals[row["Id"]]
+            if row["Name"] in icons:
+                icons[copied_row["Name"]] = icons[row["Name"]]
+        expansion_rows += [
+            {"#": int(row["#"]) + copy * expansion_count, "Name": f"{row['Name']} ({copy})"}
+            for row in expansion_rows[:expansion_count]
+        ]
+
+    for i in range(extra_rows):
+        row = empty_quest_row(header)
+        row.update(
+            {
+                "#": 10 * COPY_NUMBER_OFFSET * max(scale, 1) + i,
+                "Id": f"SubExt{i % 1000:03d}_{i % 100000:05d}",
+                "Name": f"Extra Side Quest {i}",
+                "Expansion": i % expansion_count,
+                "EventIconType": 8,
+            }
+        )
+        scaled_rows.append(row)
+
+    for row in scaled_rows:
+        for column in header:
+            row.setdefault(column, 0)
+
+    csv_files = {
+        "Quest.csv": write_csv_rows(header, scaled_rows),
+        "ExVersion.csv": write_csv_rows(["#", "Name"], expansion_rows),
+    }
+    with open(os.path.join(csv_dir, "InstanceContent.csv"), "rb") as csv_file:
+        csv_files["InstanceContent.csv"] = csv_file.read()
+    return Dataset(
+        csv_files,
+        journals,
+        content_finder_conditions,
+        icons,
+        expected_quests if scale == 1 else None,
+    )
+
+if __name__ == "__main__":
+    # Re-record the fixtures from a build: python data/benchmarks/fixtures.py [Quests.json]
+    record_fixtures(sys.argv[1] if len(sys.argv) > 1 else QUESTS_JSON_PATH)
+    print(f"Fixtures written to {FIXTURES_DIR}")
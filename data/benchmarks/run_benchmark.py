@@ -0,0 +1,154 @@
+import argparse
+import itertools
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixtures import load_dataset
+from server import FixtureServer
+
+"""
+    Runs prepare_quest_data.py end-to-end against the fixture server, once per combination
+    of the given options, and reports throughput and latency for each stage.
+
+    python data/benchmarks/run_benchmark.py --scale 1 4 --latency-ms 0 20 --workers 8 16
+
+    With --local the CSVs are read from a checkout of the fixtures instead of the server.
+"""
+
+PIPELINE_SCRIPT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "prepare_quest_data.py"
+)
+
+parser = argparse.ArgumentParser(description="Benchmark the quest pipeline offline.")
+parser.add_argument("--scale", type=int, nargs="+", default=[1], help="Copies of the MSQ to serve.")
+parser.add_argument("--extra-rows", type=int, default=0, help="Side quest rows added to Quest.csv.")
+parser.add_argument("--extra-columns", type=int, default=0, help="Unused columns added to Quest.csv.")
+parser.add_argument("--latency-ms", type=float, nargs="+", default=[0], help="Delay added to every response.")
+parser.add_argument("--workers", type=int, nargs="+", default=[8], help="Fetch workers of the pipeline.")
+parser.add_argument("--rate-limit", type=float, default=0, help="Per-host rate limit of the pipeline, 0 disables it.")
+parser.add_argument("--repeat", type=int, default=1, help="Runs per combination, the fastest one is reported.")
+parser.add_argument("--local", action="store_true", help="Read the CSVs from a local checkout of the fixtures.")
+parser.add_argument("--pipeline-args", default="", help="Extra arguments for prepare_quest_data.py.")
+parser.add_argument("--output", help="Write all results to this JSON file.")
+
+def run_pipeline(server, workers, rate_limit, pipeline_args, dataset=None):
+    # With a dataset, its CSVs are read from a checkout instead of the server
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.makedirs(os.path.join(work_dir, "static"))
+        os.makedirs(os.path.join(work_dir, "data"))
+        if dataset is not None:
+            checkout_dir = os.path.join(work_dir, "ffxiv-datamining")
+            dataset.write_checkout(checkout_dir)
+            pipeline_args = ["--datamining-dir", checkout_dir, *pipeline_args]
+        command = [
+            sys.executable,
+            PIPELINE_SCRIPT_PATH,
+            "--auto-yes",
+            "--profile",
+            "--workers",
+            str(workers),
+            "--rate-limit",
+            str(rate_limit),
+            "--datamining-url",
+            server.datamining_url,
+            "--xivapi-url",
+            server.xivapi_url,
+            *pipeline_args,
+        ]
+        started_at = time.perf_counter()
+        result = subprocess.run(command, cwd=work_dir, capture_output=True, text=True)
+        seconds = time.perf_counter() - started_at
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr[-4000:])
+            raise RuntimeError(f"Pipeline exited with {result.returncode}")
+        with open(os.path.join(work_dir, "static", "Quests.profile.json")) as report_file:
+            report = json.load(report_file)
+        report["process_seconds"] = round(seconds, 3)
+        return report
+
+def summarize_stage(stage):
+    fetch = stage["fetch"]
+    return {
+        "name": stage["name"],
+        "seconds": stage["seconds"],
+        "requests": fetch["requests"],
+        "requests_per_second": round(fetch["requests"] / stage["seconds"], 1)
+        if stage["seconds"]
+        else None,
+        "mean_latency_ms": round(1000 * fetch["request_seconds"] / fetch["requests"], 2)
+        if fetch["requests"]
+        else None,
+        "bytes": fetch["bytes"],
+        "peak_mb": stage["peak_mb"],
+    }
+
+def print_result(result):
+    print(
+        f"\nscale={result['scale']} latency={result['latency_ms']}ms workers={result['workers']}: "
+        f"{result['quests']} quests in {result['seconds']}s "
+        f"({result['quests_per_second']} quests/s, process {result['process_seconds']}s, "
+        f"process peak RSS {result['peak_rss_mb']} MB)"
+    )
+    print(f"  {'stage':<16}{'seconds':>10}{'requests':>10}{'req/s':>10}{'latency ms':>12}{'peak MB':>10}")
+    for stage in result["stages"]:
+        print(
+            f"  {stage['name']:<16}{stage['seconds']:>10}{stage['requests']:>10}"
+            f"{str(stage['requests_per_second'] or '-'):>10}"
+            f"{str(stage['mean_latency_ms'] or '-'):>12}{str(stage['peak_mb']):>10}"
+        )
+
+def main():
+    args = parser.parse_args()
+    pipeline_args = shlex.split(args.pipeline_args)
+    results = []
+
+    for scale in args.scale:
+        dataset = load_dataset(
+            scale=scale, extra_rows=args.extra_rows, extra_columns=args.extra_columns
+        )
+        for latency_ms, workers in itertools.product(args.latency_ms, args.workers):
+            reports = []
+            for _ in range(args.repeat):
+                with FixtureServer(dataset, latency=latency_ms / 1000) as server:
+                    reports.append(
+                        run_pipeline(
+                            server,
+                            workers,
+                            args.rate_limit,
+                            pipeline_args,
+                            dataset if args.local else None,
+                        )
+                    )
+            report = min(reports, key=lambda report: report["seconds"])
+            if (
+                dataset.expected_quests is not None
+                and report["emitted_quests"] != dataset.expected_quests
+            ):
+                raise RuntimeError(
+                    f"The fixtures gave {report['emitted_quests']} quests, the build they were recorded from has {dataset.expected_quests}. Re-record them."
+                )
+            result = {
+                "scale": scale,
+                "latency_ms": latency_ms,
+                "workers": workers,
+                "quests": report["quests"],
+                "seconds": report["seconds"],
+                "process_seconds": report["process_seconds"],
+                "quests_per_second": round(report["quests"] / report["seconds"], 1),
+                "peak_rss_mb": report["peak_rss_mb"],
+                "stages": [summarize_stage(stage) for stage in report["stages"]],
+            }
+            print_result(result)
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=4)
+
+if __name__ == "__main__":
+    main()
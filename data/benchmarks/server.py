@@ -0,0 +1,157 @@
+import hashlib
+import json
+import re
+import struct
+import threading
+import time
+import zlib
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+"""
+    Stand-in for raw.githubusercontent.com and beta.xivapi.com
+
+    Serves a fixtures Dataset under
+      /datamining/csv/<locale>/...   (the ffxiv-datamining repository files, English for every locale)
+      /xivapi/...                    (search, ContentFinderCondition sheet and asset endpoints)
+    with an optional delay per request to simulate network latency. Responses carry an
+    ETag and honour If-None-Match, so cached runs can be benchmarked too.
+"""
+
+JOURNAL_PATH_PATTERN = re.compile(r"^/datamining/csv/[a-z]{2}/quest/(\d{3})/([^/]+)\.csv$")
+CSV_PATH_PATTERN = re.compile(r"^/datamining/csv/[a-z]{2}/([^/]+\.csv)$")
+SEARCH_QUERY_PATTERN = re.compile(r'^Name~"(.*)"$')
+ASSET_IMAGE_SIZE = (8, 4)
+
+def png_chunk(chunk_type, data):
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data))
+    )
+
+def build_asset_png(image_path):
+    # A small single colour PNG, the colour derived from the path so every path is distinct
+    width, height = ASSET_IMAGE_SIZE
+    colour = hashlib.sha256(image_path.encode("utf-8")).digest()[:3]
+    rows = b"".join(b"\x00" + colour * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + png_chunk(b"IDAT", zlib.compress(rows))
+        + png_chunk(b"IEND", b"")
+    )
+
+class FixtureServer:
+    def __init__(self, dataset, latency=0.0):
+        self.dataset = dataset
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self.build_handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def datamining_url(self):
+        return f"{self.base_url}/datamining"
+
+    @property
+    def xivapi_url(self):
+        return f"{self.base_url}/xivapi"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def resolve(self, path, query):
+        # Returns (status, body, content type) for a request
+        dataset = self.dataset
+
+        match = JOURNAL_PATH_PATTERN.match(path)
+        if match:
+            folder, quest_id = match.groups()
+            body = dataset.journal_csv(quest_id)
+            if body is None or quest_id.rpartition("_")[2][:3] != folder:
+                return 404, b"", "text/plain"
+            return 200, body, "text/csv"
+
+        match = CSV_PATH_PATTERN.match(path)
+        if match and match.group(1) in dataset.csv_files:
+            return 200, dataset.csv_files[match.group(1)], "text/csv"
+
+        if path == "/xivapi/search":
+            match = SEARCH_QUERY_PATTERN.match(query.get("query", [""])[0])
+            icon = dataset.icons.get(match.group(1)) if match else None
+            results = (
+                [{"fields": {"Name": match.group(1), "Icon": {"path_hr1": icon}}}]
+                if icon
+                else []
+            )
+            return 200, json.dumps({"results": results}).encode("utf-8"), "application/json"
+
+        if path == "/xivapi/asset":
+            image_path = query.get("path", [""])[0]
+            if not image_path:
+                return 404, b"", "text/plain"
+            return 200, build_asset_png(image_path), "image/png"
+
+        rows = dataset.content_finder_conditions
+        if path == "/xivapi/sheet/ContentFinderCondition":
+            row_ids = query.get("rows", [""])[0].split(",")
+            body = {
+                "rows": [
+                    {"row_id": int(row_id), **rows[row_id]}
+                    for row_id in row_ids
+                    if row_id in rows
+                ]
+            }
+            return 200, json.dumps(body).encode("utf-8"), "application/json"
+        if path.startswith("/xivapi/sheet/ContentFinderCondition/"):
+            row_id = path.rpartition("/")[2]
+            if row_id in rows:
+                body = {"row_id": int(row_id), **rows[row_id]}
+                return 200, json.dumps(body).encode("utf-8"), "application/json"
+
+        return 404, b"", "text/plain"
+
+    def build_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                url = urlparse(self.path)
+                status, body, content_type = server.resolve(url.path, parse_qs(url.query))
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    status, body = 304, b""
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,255 @@
+import io
+import mmap
+import os
+import posixpath
+import shutil
+import tarfile
+import zipfile
+
+import logging
+
+"""
+    Datamining sources
+
+    Where the ffxiv-datamining files come from. Paths are relative to the root of the
+    repository, e.g. csv/en/Quest.csv:
+
+    RemoteDatamining   one request per file to raw.githubusercontent.com, through the Fetcher
+    LocalDatamining    a checkout of xivapi/ffxiv-datamining, files are memory-mapped.
+                       A shallow, sparse clone of the csv/<locale> folders is enough
+    open_archive()     a downloaded .zip or .tar.gz of the repository, extracted once and
+                       then read like a checkout. Members that would land outside the
+                       extraction folder are skipped
+
+    Every source offers:
+
+    read_text(path)           the decoded file, or None
+    open(path)                the file to stream from .raw, used as a context manager, or None
+    list_csv_files(folder)    CSV name without .csv -> subfolder, for every CSV below folder
+"""
+
+DEFAULT_DATAMINING_URL = "https://raw.githubusercontent.com/xivapi/ffxiv-datamining/master"
+GITHUB_TREE_URL = "https://api.github.com/repos/xivapi/ffxiv-datamining/git/trees/master:{folder}"
+ARCHIVE_MEMBER_PREFIX = "csv/"  # Only the CSVs are extracted from an archive
+ARCHIVE_STAMP_FILE = ".archive"  # Size and mtime of the extracted archive
+ARCHIVE_EXTENSIONS = (".tar.gz", ".tgz", ".zip")  # Stripped from the name of the target folder
+
+class RemoteDatamining:
+    def __init__(self, fetcher, url=DEFAULT_DATAMINING_URL):
+        self.fetcher = fetcher
+        self.url = url.rstrip("/")
+
+    def __str__(self):
+        return self.url
+
+    def read_text(self, path, max_retries=5, delay=2):
+        response = self.fetcher.get(f"{self.url}/{path}", max_retries=max_retries, delay=delay)
+        if response is None:
+            return None
+        return response.content.decode("utf-8")
+
+    def open(self, path):
+        return self.fetcher.get(f"{self.url}/{path}", stream=True)
+
+    def list_csv_files(self, folder):
+        # One GitHub tree listing of the folder
+        response = self.fetcher.get(GITHUB_TREE_URL.format(folder=folder), params={"recursive": "1"})
+        if response is None:
+            logging.warning(f"Failed to list {folder}.")
+            return {}
+
+        try:
+            tree = response.json()
+            if tree.get("truncated"):
+                logging.warning(f"Listing of {folder} is truncated, some files may be missing.")
+            listing = {}
+            for item in tree.get("tree", []):
+                subfolder, _, file_name = item["path"].rpartition("/")
+                if item["type"] == "blob" and file_name.endswith(".csv"):
+                    listing[file_name[: -len(".csv")]] = subfolder
+            return listing
+        except Exception as e:
+            logging.warning(f"Failed to parse the listing of {folder}: {e}")
+        return {}
+
+"""
+    Local files
+"""
+
+class MappedFile(io.RawIOBase):
+    # A read-only file backed by a memory map, so a stream reads straight from the page cache
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as mapped_file:
+            # Empty files cannot be mapped
+            self.buffer = (
+                mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+                if os.fstat(mapped_file.fileno()).st_size
+                else b""
+            )
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self.buffer) - self.position)
+        buffer[:size] = self.buffer[self.position : self.position + size]
+        self.position += size
+        return size
+
+    def read_text(self):
+        # Decodes the whole map without copying it into bytes first
+        return str(self.buffer, "utf-8")
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        super().close()
+
+class MappedCsv:
+    # Looks like a streamed response: read it from .raw, close it when done
+    def __init__(self, path):
+        self.raw = io.BufferedReader(MappedFile(path))
+
+    def close(self):
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class LocalDatamining:
+    def __init__(self, root):
+        self.root = root
+
+    def __str__(self):
+        return self.root
+
+    def get_file_path(self, path):
+        return os.path.join(self.root, *path.split("/"))
+
+    def read_text(self, path, max_retries=None, delay=None):
+        # max_retries and delay are accepted like RemoteDatamining's, there is nothing to retry
+        file_path = self.get_file_path(path)
+        if not os.path.isfile(file_path):
+            logging.debug(f"{file_path} does not exist.")
+            return None
+        mapped_file = MappedFile(file_path)
+        try:
+            return mapped_file.read_text()
+        finally:
+            mapped_file.close()
+
+    def open(self, path):
+        file_path = self.get_file_path(path)
+        if not os.path.isfile(file_path):
+            logging.debug(f"{file_path} does not exist.")
+            return None
+        return MappedCsv(file_path)
+
+    def list_csv_files(self, folder):
+        folder_path = self.get_file_path(folder)
+        listing = {}
+        for directory, _, file_names in os.walk(folder_path):
+            subfolder = os.path.relpath(directory, folder_path).replace(os.sep, "/")
+            for file_name in file_names:
+                if file_name.endswith(".csv"):
+                    listing[file_name[: -len(".csv")]] = "" if subfolder == "." else subfolder
+        return listing
+
+"""
+    Archives
+"""
+
+def get_archive_stamp(archive_path):
+    archive_stat = os.stat(archive_path)
+    return f"{archive_stat.st_size} {int(archive_stat.st_mtime)}"
+
+def is_safe_member_name(name):
+    # Relative and without ".." parts or a drive, so it cannot point outside the target folder
+    parts = name.replace("\\", "/").split("/")
+    return bool(parts[0]) and ":" not in parts[0] and ".." not in parts
+
+def get_archive_members(names):
+    # GitHub archives hold everything in one top folder, e.g. ffxiv-datamining-master/,
+    # returns (name in the archive, path in the repository) of every CSV
+    paths = {}
+    for name in names:
+        if is_safe_member_name(name):
+            paths[name] = posixpath.normpath(name.replace("\\", "/"))
+        else:
+            logging.warning(f"Skipping archive member {name}, it points outside the archive.")
+
+    top_folders = {path.split("/", 1)[0] for path in paths.values()}
+    strip_top_folder = len(top_folders) == 1 and not any(
+        path.startswith(ARCHIVE_MEMBER_PREFIX) for path in paths.values()
+    )
+    members = []
+    for name, path in paths.items():
+        if strip_top_folder and "/" in path:
+            path = path.split("/", 1)[1]
+        if path.startswith(ARCHIVE_MEMBER_PREFIX) and path.endswith(".csv"):
+            members.append((name, path))
+    return members
+
+def get_target_path(target_dir, path):
+    # Where a member is extracted to, checked again once symbolic links are resolved
+    root = os.path.realpath(target_dir)
+    target_path = os.path.realpath(os.path.join(root, *path.split("/")))
+    if os.path.commonpath([root, target_path]) != root:
+        raise ValueError(f"Archive member {path} would be extracted outside {target_dir}.")
+    return target_path
+
+def extract_archive(archive_path, target_dir):
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            members = get_archive_members(archive.namelist())
+            for name, path in members:
+                target_path = get_target_path(target_dir, path)
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                with archive.open(name) as source, open(target_path, "wb") as target:
+                    shutil.copyfileobj(source, target)
+    else:
+        # The "data" filter, on Pythons that have it, also rejects links and special files
+        data_filter = getattr(tarfile, "data_filter", None)
+        with tarfile.open(archive_path) as archive:
+            files = {member.name: member for member in archive.getmembers() if member.isfile()}
+            members = get_archive_members(list(files))
+            for name, path in members:
+                member = files[name]
+                if data_filter is not None:
+                    member = data_filter(member, target_dir)
+                target_path = get_target_path(target_dir, path)
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                with archive.extractfile(member) as source, open(target_path, "wb") as target:
+                    shutil.copyfileobj(source, target)
+    return len(members)
+
+def get_archive_target_dir(archive_path):
+    # master.zip and master.tar.gz both extract to master.d
+    for extension in ARCHIVE_EXTENSIONS:
+        if archive_path.lower().endswith(extension):
+            return f"{archive_path[:-len(extension)]}.d"
+    return f"{os.path.splitext(archive_path)[0]}.d"
+
+def open_archive(archive_path, target_dir=None):
+    # Extracts the CSVs of the archive next to it, unless that was done for this very file
+    target_dir = target_dir or get_archive_target_dir(archive_path)
+    stamp_path = os.path.join(target_dir, ARCHIVE_STAMP_FILE)
+    stamp = get_archive_stamp(archive_path)
+    if os.path.exists(stamp_path):
+        with open(stamp_path) as stamp_file:
+            if stamp_file.read() == stamp:
+                logging.info(f"Using the CSVs extracted from {archive_path} in {target_dir}.")
+                return LocalDatamining(target_dir)
+
+    shutil.rmtree(target_dir, ignore_errors=True)
+    os.makedirs(target_dir)
+    extracted = extract_archive(archive_path, target_dir)
+    with open(stamp_path, "w") as stamp_file:
+        stamp_file.write(stamp)
+    logging.info(f"Extracted {extracted} CSVs from {archive_path} to {target_dir}.")
+    return LocalDatamining(target_dir)
@@ -0,0 +1,470 @@
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+"""
+    Constants
+"""
+
+DEFAULT_MAX_WORKERS = 8
+
+# Requests per second allowed for each host, anything else falls back to DEFAULT_HOST_RATE_LIMIT
+HOST_RATE_LIMITS = {
+    "raw.githubusercontent.com": 50,
+    "beta.xivapi.com": 20,  # Stay under XIVAPI's per-IP rate limit
+}
+DEFAULT_HOST_RATE_LIMIT = 10
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+DEFAULT_CONNECT_TIMEOUT = 10  # Seconds to establish a connection
+DEFAULT_READ_TIMEOUT = 60  # Seconds without receiving a byte, not for the whole body
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}  # Other statuses are answers, retrying won't change them
+MAX_BACKOFF_SECONDS = 30
+MAX_RETRY_AFTER_SECONDS = 120
+
+CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failed attempts that open a host's circuit
+CIRCUIT_RESET_SECONDS = 30  # How long an open circuit rejects requests before letting one through
+CIRCUIT_MAX_WAIT_SECONDS = 120  # Requests wait for a host that has been down for less, then fail fast
+
+"""
+    Retries
+"""
+
+def get_backoff_seconds(attempt, delay, retry_after=None):
+    # Full jitter: a random wait of up to delay * 2^(attempt - 1), unless the server named one
+    if retry_after is not None:
+        return min(retry_after, MAX_RETRY_AFTER_SECONDS)
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, delay * 2 ** (attempt - 1)))
+
+def parse_retry_after(value):
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def is_throttled(response):
+    # GitHub answers an exhausted API rate limit with 403 instead of 429
+    return response.status_code == 429 or (
+        response.status_code == 403 and response.headers.get("X-RateLimit-Remaining") == "0"
+    )
+
+def get_retry_after(response):
+    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+    if retry_after is None and response.headers.get("X-RateLimit-Reset", "").isdigit():
+        retry_after = max(0.0, int(response.headers["X-RateLimit-Reset"]) - time.time())
+    return retry_after
+
+class CircuitBreaker:
+    # One per host. failure_threshold failed attempts in a row open the circuit, requests to the
+    # host are then held back. Once reset_seconds have passed a single trial request is let
+    # through (half open): success closes the circuit, failure opens it for another reset_seconds.
+    # Held back requests wait for the circuit to close, so a short outage costs time instead of
+    # data. Once the host has been down for max_wait_seconds they fail fast instead.
+    def __init__(
+        self,
+        host,
+        failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds=CIRCUIT_RESET_SECONDS,
+        max_wait_seconds=CIRCUIT_MAX_WAIT_SECONDS,
+    ):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.down_since = None  # When the circuit last opened from closed
+        self.times_opened = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            # Restart the clock so only one trial goes through per reset_seconds
+            self.state = "half open"
+            self.opened_at = time.monotonic()
+            return True
+
+    def wait(self):
+        # Blocks until the circuit closes or may let its next trial through, returns False
+        # right away once the host has been down for too long
+        with self.changed:
+            if self.state == "closed":
+                return True
+            if time.monotonic() - self.down_since >= self.max_wait_seconds:
+                return False
+            self.changed.wait(
+                max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+            )
+            return True
+
+    def record_success(self):
+        with self.lock:
+            if self.state != "closed":
+                logging.info(f"Circuit for {self.host} closed again.")
+            self.state = "closed"
+            self.failures = 0
+            self.down_since = None
+            self.changed.notify_all()
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half open" or (
+                self.state == "closed" and self.failures >= self.failure_threshold
+            ):
+                logging.warning(
+                    f"Circuit for {self.host} opened after {self.failures} failed attempts, holding requests back for {self.reset_seconds}s."
+                )
+                if self.state == "closed":
+                    self.down_since = time.monotonic()
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                self.changed.notify_all()
+
+    @property
+    def is_open(self):
+        return self.state == "open"
+
+"""
+    Rate limiting
+"""
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+"""
+    Statistics
+"""
+
+FETCH_STAT_FIELDS = (
+    "calls",  # Calls made inside a Fetcher.kind() block
+    "busy_seconds",  # Summed over workers, so it can exceed wall time
+    "requests",
+    "request_seconds",  # Time until response headers arrived, summed over requests
+    "bytes",
+    "retries",
+    "backoff_seconds",  # Time spent waiting between attempts, summed over requests
+    "timeouts",
+    "throttled",  # 429 and rate limit answers
+    "circuit_rejections",  # Requests not made because the host's circuit stayed open
+    "circuit_wait_seconds",  # Time requests spent waiting for an open circuit, summed over requests
+    "stale_fallbacks",  # Failed requests answered from an expired cache entry
+    "cache_hits",
+    "not_modified",
+    "not_found",
+    "failures",
+)
+
+class FetchStats:
+    # Counters per kind of fetch (images, journal, ...), requests outside a kind count as "other".
+    # The fetcher keeps a second instance keyed by host
+    def __init__(self):
+        self.by_kind = {}
+        self.lock = threading.Lock()
+
+    def add(self, kind, **counts):
+        with self.lock:
+            kind_stats = self.by_kind.setdefault(
+                kind, dict.fromkeys(FETCH_STAT_FIELDS, 0)
+            )
+            for field, count in counts.items():
+                kind_stats[field] += count
+
+    def snapshot(self):
+        with self.lock:
+            return {kind: dict(kind_stats) for kind, kind_stats in self.by_kind.items()}
+
+    def totals(self):
+        totals = dict.fromkeys(FETCH_STAT_FIELDS, 0)
+        for kind_stats in self.snapshot().values():
+            for field, count in kind_stats.items():
+                totals[field] += count
+        return totals
+
+"""
+    Fetcher
+"""
+
+class Fetcher:
+    # Pooled session + per-host token buckets and circuit breakers + a bounded worker pool.
+    # A single instance is shared by every fetch in a run so connections are reused.
+    def __init__(
+        self,
+        max_workers=DEFAULT_MAX_WORKERS,
+        host_rate_limits=None,
+        rate_limit=None,
+        max_retries=5,
+        delay=2,
+        cache=None,
+        offline=False,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+    ):
+        self.max_workers = max_workers
+        self.host_rate_limits = host_rate_limits or HOST_RATE_LIMITS
+        self.rate_limit = rate_limit  # Overrides every host's limit when set, 0 disables limiting
+        self.max_retries = max_retries
+        self.delay = delay
+        self.cache = cache
+        self.offline = offline
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.buckets = {}
+        self.breakers = {}
+        self.buckets_lock = threading.Lock()
+
+        self.stats = FetchStats()
+        self.host_stats = FetchStats()
+        self.local = threading.local()
+
+    @contextmanager
+    def kind(self, name):
+        # Attributes requests made by this thread to a kind of fetch, and times the block
+        previous_kind = getattr(self.local, "kind", None)
+        self.local.kind = name
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stats.add(name, calls=1, busy_seconds=time.perf_counter() - started_at)
+            self.local.kind = previous_kind
+
+    def count(self, host, **counts):
+        self.stats.add(getattr(self.local, "kind", None) or "other", **counts)
+        self.host_stats.add(host, **counts)
+        if counts.get("failures"):
+            self.local.failures = self.thread_failures() + counts["failures"]
+
+    def thread_failures(self):
+        # Requests of the calling thread that got no answer so far, 404s are answers. Compare
+        # two readings to tell data that does not exist from data that could not be fetched
+        return getattr(self.local, "failures", 0)
+
+    def breaker_for(self, host):
+        with self.buckets_lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(host)
+            return self.breakers[host]
+
+    def bucket_for(self, host):
+        with self.buckets_lock:
+            if host not in self.buckets:
+                rate = (
+                    self.host_rate_limits.get(host, DEFAULT_HOST_RATE_LIMIT)
+                    if self.rate_limit is None
+                    else self.rate_limit
+                )
+                self.buckets[host] = TokenBucket(rate) if rate else None
+            return self.buckets[host]
+
+    def get(self, url, params=None, max_retries=None, delay=None, stream=False):
+        # With stream=True the caller reads the body from response.raw and closes the response
+        max_retries = max_retries or self.max_retries
+        delay = self.delay if delay is None else delay
+        host = urlparse(url).netloc
+
+        # Serve fresh entries straight from the cache, stale ones get revalidated below
+        entry = self.cache.lookup(url, params) if self.cache else None
+        if entry is not None and (self.offline or entry.is_fresh(self.cache.ttl)):
+            self.count(host, cache_hits=1)
+            return self.cached_or_none(entry)
+        if self.offline:
+            logging.warning(f"Offline and not cached: {url} with params {params}.")
+            self.count(host, failures=1)
+            return None
+        headers = entry.conditional_headers() if entry is not None else None
+
+        bucket = self.bucket_for(host)
+        breaker = self.breaker_for(host)
+        attempts = 0
+        for attempt in range(1, max_retries + 1):
+            if not self.wait_for_circuit(host, breaker):
+                logging.debug(f"Circuit for {host} is open, not requesting {url}.")
+                self.count(host, circuit_rejections=1)
+                break
+            if bucket is not None:
+                bucket.acquire()
+            attempts += 1
+            self.count(host, requests=1, retries=1 if attempt > 1 else 0)
+            retry_after = None
+            try:
+                requested_at = time.perf_counter()
+                response = self.session.get(
+                    url, params=params, headers=headers, stream=stream, timeout=self.timeout
+                )
+                self.count(host, request_seconds=time.perf_counter() - requested_at)
+                if response.status_code in RETRY_STATUSES or is_throttled(response):
+                    breaker.record_failure()
+                    retry_after = get_retry_after(response)
+                    if is_throttled(response):
+                        self.count(host, throttled=1)
+                    logging.warning(
+                        f"Request failed with status {response.status_code} (attempt {attempt}/{max_retries}): {url}"
+                    )
+                    response.close()
+                else:
+                    breaker.record_success()
+                    if response.status_code == 304 and entry is not None:
+                        self.count(host, cache_hits=1, not_modified=1)
+                        response.close()
+                        return self.cached_or_none(self.cache.revalidated(entry))
+                    if response.status_code == 200:
+                        if stream:
+                            response.raw.decode_content = True
+                            # Stay readable once exhausted, io.TextIOWrapper needs that
+                            response.raw.auto_close = False
+                        if self.cache and stream:
+                            # Spool the body to disk and hand out the cached file instead
+                            with response:
+                                entry = self.cache.store_stream(
+                                    url,
+                                    params,
+                                    200,
+                                    response.iter_content(STREAM_CHUNK_SIZE),
+                                    response.headers,
+                                )
+                            self.count(host, bytes=entry.size)
+                            return self.cache.read(entry)
+                        if stream:
+                            self.count(host, bytes=int(response.headers.get("Content-Length", 0)))
+                            return response
+                        self.count(host, bytes=len(response.content))
+                        if self.cache:
+                            self.cache.store(
+                                url, params, 200, response.content, response.headers
+                            )
+                        return response
+                    if response.status_code == 404:
+                        logging.debug(f"Resource not found: {url} with params {params}.")
+                        self.count(host, not_found=1)
+                        if self.cache:
+                            self.cache.store(url, params, 404, b"", response.headers)
+                        return None
+                    logging.warning(
+                        f"Request failed with status {response.status_code}, not retrying: {url}"
+                    )
+                    response.close()
+                    break
+            except requests.exceptions.RequestException as e:
+                breaker.record_failure()
+                if isinstance(e, requests.exceptions.Timeout):
+                    self.count(host, timeouts=1)
+                logging.warning(f"Request error on attempt {attempt}/{max_retries}: {e}")
+            if attempt < max_retries and not breaker.is_open:
+                backoff_seconds = get_backoff_seconds(attempt, delay, retry_after)
+                self.count(host, backoff_seconds=backoff_seconds)
+                time.sleep(backoff_seconds)
+
+        if entry is not None:
+            logging.warning(f"Failed to fetch: {url}, using the expired cached copy.")
+            self.count(host, stale_fallbacks=1)
+            return self.cached_or_none(entry)
+        if breaker.is_open:
+            logging.error(f"Failed to fetch: {url} after {attempts} attempts, the circuit for {host} is open.")
+        else:
+            logging.error(f"Failed to fetch: {url} after {attempts} attempts.")
+        self.count(host, failures=1)
+        return None
+
+    def wait_for_circuit(self, host, breaker):
+        # Returns True once the host's circuit lets this request through, False if it gave up
+        while not breaker.allow():
+            waited_at = time.perf_counter()
+            if not breaker.wait():
+                return False
+            self.count(host, circuit_wait_seconds=time.perf_counter() - waited_at)
+        return True
+
+    def cached_or_none(self, entry):
+        # Misses are cached too (as 404) so offline runs see the same gaps as online ones
+        if entry.status != 200:
+            return None
+        return self.cache.read(entry)
+
+    def map(self, fn, items):
+        # Runs fn over items on the worker pool, yielding results in input order
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from executor.map(fn, items)
+
+    def host_report(self):
+        # Per-host counters and circuit state, for diagnosing slow or failing hosts
+        host_stats = self.host_stats.snapshot()
+        with self.buckets_lock:
+            breakers = dict(self.breakers)
+        return {
+            host: {
+                **stats,
+                "circuit": breakers[host].state if host in breakers else "closed",
+                "times_opened": breakers[host].times_opened if host in breakers else 0,
+            }
+            for host, stats in host_stats.items()
+        }
+
+    def log_host_report(self):
+        for host, report in self.host_report().items():
+            if report["retries"] or report["failures"] or report["circuit_rejections"]:
+                logging.info(
+                    f"{host}: {report['requests']} requests, {report['retries']} retries, "
+                    f"{report['timeouts']} timeouts, {report['throttled']} throttled, "
+                    f"{report['failures']} failures, {report['stale_fallbacks']} served from an expired cache entry, "
+                    f"{report['backoff_seconds']:.1f}s backing off, {report['circuit_wait_seconds']:.1f}s waiting for the circuit, "
+                    f"circuit opened {report['times_opened']} times."
+                )
+
+    def close(self):
+        self.log_host_report()
+        self.session.close()
+        if self.cache:
+            self.cache.close()
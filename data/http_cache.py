@@ -0,0 +1,267 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from urllib.parse import urlencode
+
+"""
+    Constants
+"""
+
+DEFAULT_CACHE_DIR = "data/.cache"
+DEFAULT_CACHE_TTL_HOURS = 24  # Entries older than this are revalidated with a conditional request
+DEFAULT_CACHE_MAX_SIZE_MB = 512
+UNUSED_ENTRY_MAX_AGE = 30 * 24 * 3600  # Entries nobody asked for in this long are evicted
+
+"""
+    Responses
+"""
+
+class CachedResponse:
+    # Mirrors the parts of requests.Response the pipeline reads, the body is only read
+    # from disk when content or raw is accessed
+    def __init__(self, url, status_code, body_path, headers):
+        self.url = url
+        self.status_code = status_code
+        self.body_path = body_path
+        self.headers = headers
+        self.from_cache = True
+        self.loaded_content = None
+        self.body_file = None
+
+    @property
+    def content(self):
+        if self.loaded_content is None:
+            with open(self.body_path, "rb") as body_file:
+                self.loaded_content = body_file.read()
+        return self.loaded_content
+
+    @property
+    def raw(self):
+        if self.body_file is None:
+            self.body_file = open(self.body_path, "rb")
+        return self.body_file
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        if self.body_file is not None:
+            self.body_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class CacheEntry:
+    def __init__(
+        self, key, url, status, etag, last_modified, body_hash, size, fetched_at
+    ):
+        self.key = key
+        self.url = url
+        self.status = status
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+        self.size = size
+        self.fetched_at = fetched_at
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched_at < ttl
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+"""
+    Cache
+"""
+
+class HttpCache:
+    # SQLite index of responses keyed by URL + params, bodies stored once per content hash:
+    #   <cache_dir>/index.sqlite
+    #   <cache_dir>/bodies/ab/abcdef...
+    def __init__(
+        self,
+        cache_dir=DEFAULT_CACHE_DIR,
+        ttl=DEFAULT_CACHE_TTL_HOURS * 3600,
+        max_size=DEFAULT_CACHE_MAX_SIZE_MB * 1024 * 1024,
+    ):
+        self.cache_dir = cache_dir
+        self.bodies_dir = os.path.join(cache_dir, "bodies")
+        self.ttl = ttl
+        self.max_size = max_size
+        os.makedirs(self.bodies_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(
+            os.path.join(cache_dir, "index.sqlite"), check_same_thread=False
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                body_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self.db.commit()
+
+    @staticmethod
+    def key_for(url, params=None):
+        full_url = f"{url}?{urlencode(sorted(params.items()))}" if params else url
+        return hashlib.sha256(full_url.encode("utf-8")).hexdigest()
+
+    def body_path(self, body_hash):
+        return os.path.join(self.bodies_dir, body_hash[:2], body_hash)
+
+    def lookup(self, url, params=None):
+        key = self.key_for(url, params)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT key, url, status, etag, last_modified, body_hash, size, fetched_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(*row)
+        if not os.path.exists(self.body_path(entry.body_hash)):
+            return None
+        return entry
+
+    def read(self, entry):
+        with self.lock:
+            self.db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), entry.key),
+            )
+        return CachedResponse(
+            entry.url, entry.status, self.body_path(entry.body_hash), {}
+        )
+
+    def revalidated(self, entry):
+        # A 304 means the stored body is still current, restart its TTL
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, entry.key),
+            )
+            self.db.commit()
+        entry.fetched_at = now
+        return entry
+
+    def store(self, url, params, status, content, headers):
+        body_hash = hashlib.sha256(content).hexdigest()
+        path = self.body_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as body_file:
+                body_file.write(content)
+            os.replace(tmp_path, path)
+        self.index(url, params, status, headers, body_hash, len(content))
+
+    def store_stream(self, url, params, status, chunks, headers):
+        # Writes the body to disk chunk by chunk, hashing as it goes, so large files
+        # never have to be held in memory
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = os.path.join(self.cache_dir, f"incoming.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as body_file:
+            for chunk in chunks:
+                digest.update(chunk)
+                body_file.write(chunk)
+                size += len(chunk)
+        body_hash = digest.hexdigest()
+        path = self.body_path(body_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        self.index(url, params, status, headers, body_hash, size)
+        return self.lookup(url, params)
+
+    def index(self, url, params, status, headers, body_hash, size):
+        key = self.key_for(url, params)
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    url,
+                    status,
+                    headers.get("ETag"),
+                    headers.get("Last-Modified"),
+                    body_hash,
+                    size,
+                    now,
+                    now,
+                ),
+            )
+            self.db.commit()
+
+    def evict(self):
+        # Drop long-unused entries, then least recently used ones until under max_size
+        with self.lock:
+            self.db.execute(
+                "DELETE FROM responses WHERE accessed_at < ?",
+                (time.time() - max(self.ttl, UNUSED_ENTRY_MAX_AGE),),
+            )
+            total_size = self.db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total_size > self.max_size:
+                for key, size in self.db.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+                ).fetchall():
+                    if total_size <= self.max_size:
+                        break
+                    self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    total_size -= size
+            self.db.commit()
+
+            # Remove bodies that no entry points to anymore
+            referenced = {
+                body_hash
+                for (body_hash,) in self.db.execute(
+                    "SELECT DISTINCT body_hash FROM responses"
+                )
+            }
+        removed = 0
+        for shard in os.listdir(self.bodies_dir):
+            shard_dir = os.path.join(self.bodies_dir, shard)
+            for body_hash in os.listdir(shard_dir):
+                if body_hash not in referenced:
+                    os.remove(os.path.join(shard_dir, body_hash))
+                    removed += 1
+        if removed:
+            logging.info(f"Evicted {removed} cached response bodies.")
+
+    def close(self):
+        self.evict()
+        with self.lock:
+            self.db.commit()
+            self.db.close()
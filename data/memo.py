@@ -0,0 +1,74 @@
+import logging
+import threading
+
+class Memo:
+    # In-process lookup table shared by all workers. Values can be primed in bulk before
+    # enrichment, anything missing is resolved on first use and remembered, failures included.
+    # Concurrent lookups of a key that is still being resolved wait for that one resolution.
+    # Given the fetcher, a resolution whose requests failed is remembered as failed(key)
+    def __init__(self, name, fetcher=None):
+        self.name = name
+        self.fetcher = fetcher
+        self.values = {}
+        self.failed_keys = set()
+        self.pending = {}
+        self.primed = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def prime(self, values):
+        with self.lock:
+            self.values.update(values)
+            self.primed += len(values)
+
+    def get(self, key, resolve):
+        with self.lock:
+            if key in self.values:
+                self.hits += 1
+                return self.values[key]
+            resolved = self.pending.get(key)
+            is_resolver = resolved is None
+            if is_resolver:
+                self.misses += 1
+                resolved = self.pending[key] = threading.Event()
+            else:
+                self.hits += 1
+
+        if not is_resolver:
+            resolved.wait()
+            with self.lock:
+                return self.values.get(key)
+
+        value = None
+        failures = self.fetcher.thread_failures() if self.fetcher else 0
+        try:
+            value = resolve(key)
+        finally:
+            with self.lock:
+                self.values[key] = value
+                if self.fetcher and self.fetcher.thread_failures() > failures:
+                    self.failed_keys.add(key)
+                del self.pending[key]
+            resolved.set()
+        return value
+
+    def failed(self, key):
+        with self.lock:
+            return key in self.failed_keys
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.values),
+                "primed": self.primed,
+                "hits": self.hits,
+                "misses": self.misses,
+                "failed": len(self.failed_keys),
+            }
+
+    def report(self):
+        stats = self.stats()
+        logging.info(
+            f"{self.name}: {stats['entries']} entries ({stats['primed']} primed), {stats['hits']} hits, {stats['misses']} misses."
+        )
@@ -0,0 +1,99 @@
+import hashlib
+import os
+
+import logging
+
+"""
+    Output files
+
+    Everything the app loads is written to a temporary file next to its destination, synced
+    to disk and renamed over it, so a run that dies mid-write leaves the previous file in
+    place instead of a truncated one the weekly workflow would commit. Contents are hashed
+    while they are written: a file whose contents did not change is left untouched.
+"""
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def get_file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as existing_file:
+        for chunk in iter(lambda: existing_file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def has_contents(path, data):
+    return (
+        os.path.exists(path)
+        and os.path.getsize(path) == len(data)
+        and get_file_digest(path) == hashlib.sha256(data).hexdigest()
+    )
+
+def sync_directory(path):
+    # Makes the rename itself durable, not supported on every platform
+    try:
+        directory_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directory_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(directory_fd)
+
+class AtomicFile:
+    # Use as a context manager and write() bytes to it, the file is replaced when the block
+    # exits without an error. changed tells whether it was
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.changed = None
+        self.tmp_file = None
+
+    def __enter__(self):
+        self.tmp_file = open(self.tmp_path, "wb")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        self.tmp_file.write(data)
+
+    def is_unchanged(self):
+        return (
+            os.path.exists(self.path)
+            and os.path.getsize(self.path) == self.size
+            and get_file_digest(self.path) == self.digest.hexdigest()
+        )
+
+    def commit(self):
+        if self.is_unchanged():
+            self.discard()
+            self.changed = False
+            logging.debug(f"{self.path} is unchanged.")
+            return
+        self.tmp_file.flush()
+        os.fsync(self.tmp_file.fileno())
+        self.tmp_file.close()
+        os.replace(self.tmp_path, self.path)
+        sync_directory(self.path)
+        self.changed = True
+
+    def discard(self):
+        self.tmp_file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+def write_atomic(path, data):
+    # Returns True if the file was written, False if it already held data
+    with AtomicFile(path) as output_file:
+        output_file.write(data)
+    return output_file.changed
@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+import logging
+
+"""
+    Parse pool
+
+    Runs CPU-bound work on large batches (converting images, for now) in worker processes,
+    so it uses every core instead of competing for one interpreter with the fetch threads.
+    Workers are spawned rather than forked, the fetcher's threads are already running, and
+    are only started by the first batch that is large enough. Smaller batches, or a pool of
+    one worker, run inline. Functions and their arguments must be picklable, so they have
+    to be module-level functions.
+"""
+
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 1
+MIN_POOL_BATCH_SIZE = 32  # Starting the workers costs more than smaller batches take
+CHUNKS_PER_WORKER = 4  # Items are handed out in chunks, a few per worker to even out the load
+
+class ParsePool:
+    def __init__(self, max_workers=DEFAULT_PARSE_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self.executor = None
+
+    def map(self, function, items):
+        # Returns the results in the order of items
+        items = list(items)
+        if self.max_workers == 1 or len(items) < MIN_POOL_BATCH_SIZE:
+            return [function(item) for item in items]
+
+        if self.executor is None:
+            logging.debug(f"Starting {self.max_workers} parse workers.")
+            self.executor = ProcessPoolExecutor(
+                self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        chunksize = max(1, len(items) // (self.max_workers * CHUNKS_PER_WORKER))
+        return list(self.executor.map(function, items, chunksize=chunksize))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
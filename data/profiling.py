@@ -0,0 +1,104 @@
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+from datetime import datetime, timezone
+
+from output_files import write_atomic
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+def get_peak_rss_mb():
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return round(peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def get_traced_peak_mb():
+    # Peak of the memory Python allocated since the last reset_peak(), on every thread
+    return round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+
+def diff_counts(after, before):
+    return {
+        field: round(count - before.get(field, 0), 3) for field, count in after.items()
+    }
+
+class Profiler:
+    # Splits a run into consecutive stages, stage() ends the running stage and starts the next.
+    # Each stage records wall time, the fetch counters it added and its own peak memory, traced
+    # with tracemalloc while profiling (which slows allocations down a little). The process'
+    # peak RSS so far is recorded too, it can only grow from one stage to the next.
+    def __init__(self, fetcher, enabled=True):
+        self.fetcher = fetcher
+        self.enabled = enabled
+        self.started_at = time.perf_counter()
+        self.stages = []
+        self.current = None
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name):
+        if not self.enabled:
+            return
+        self.end_stage()
+        tracemalloc.reset_peak()
+        self.current = {
+            "name": name,
+            "started_at": time.perf_counter(),
+            "fetch_totals": self.fetcher.stats.totals(),
+            "fetch_by_kind": self.fetcher.stats.snapshot(),
+        }
+
+    def end_stage(self):
+        if not self.enabled or self.current is None:
+            return
+        stage = self.current
+        self.current = None
+
+        fetch_by_kind = {}
+        for kind, kind_stats in self.fetcher.stats.snapshot().items():
+            kind_diff = diff_counts(kind_stats, stage["fetch_by_kind"].get(kind, {}))
+            if any(kind_diff.values()):
+                fetch_by_kind[kind] = kind_diff
+
+        self.stages.append(
+            {
+                "name": stage["name"],
+                "seconds": round(time.perf_counter() - stage["started_at"], 3),
+                "fetch": diff_counts(self.fetcher.stats.totals(), stage["fetch_totals"]),
+                "fetch_by_kind": fetch_by_kind,
+                "peak_mb": get_traced_peak_mb(),
+                "process_peak_rss_mb": get_peak_rss_mb(),
+            }
+        )
+
+    def report(self, extra=None):
+        self.end_stage()
+        return {
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - self.started_at, 3),
+            "peak_rss_mb": get_peak_rss_mb(),
+            "fetch": self.fetcher.stats.totals(),
+            "fetch_by_kind": self.fetcher.stats.snapshot(),
+            "fetch_by_host": self.fetcher.host_report(),
+            "stages": self.stages,
+            **(extra or {}),
+        }
+
+    def write(self, path, extra=None):
+        if not self.enabled:
+            return
+        report = self.report(extra)
+        write_atomic(path, json.dumps(report, indent=4).encode("utf-8"))
+
+        logging.info(f"Profile written to {path} ({report['seconds']}s in total).")
+        for stage in report["stages"]:
+            logging.info(
+                f"  {stage['name']}: {stage['seconds']}s, {stage['fetch']['requests']} requests, {stage['fetch']['bytes']} bytes, peak {stage['peak_mb']} MB"
+            )
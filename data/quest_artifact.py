@@ -0,0 +1,209 @@
+import gzip
+import json
+import os
+
+import logging
+
+from output_files import AtomicFile, has_contents, write_atomic
+
+try:
+    import brotli
+except ImportError:  # Optional, only the .gz copy is written without it
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # Optional, the json module gives the same bytes, only slower
+    orjson = None
+
+"""
+    Compact artifact
+
+    Quests.json repeats every key and most strings on each quest. The compact artifact holds
+    the same data column by column, with every string stored once in a string table:
+
+    {
+      "version": 1,
+      "strings": ["A Realm Reborn", "Gridania", ...],
+      "expansions": [[name, [[group, first row, row count], ...]], ...],
+      "quests": {"#": [...], "Id": [...], ..., "Unlocks": [[unlock row, ...], ...]},
+      "unlocks": {"Name": [...], "Image": [...], "ContentTypeName": [...]}
+    }
+
+    Strings are indexes into "strings", -1 stands for null. Quest rows are in Quests.json
+    order, so every group is a contiguous range of rows. PreviousQuests and NextMSQ keep
+    their quest numbers. expand_compact_quests() rebuilds Quests.json from it, as does
+    src/lib/compactQuests.ts in the app.
+"""
+
+COMPACT_FORMAT_VERSION = 1
+NO_STRING = -1
+
+QUEST_STRING_FIELDS = ("Id", "Name", "Description", "ExpansionName", "QuestGroup", "Image")
+QUEST_FIELDS = (
+    "#",
+    "Id",
+    "Name",
+    "Description",
+    "ExpansionName",
+    "EventIconType",
+    "PreviousQuests",
+    "NextMSQ",
+    "QuestGroup",
+    "Image",
+    "Unlocks",
+)
+UNLOCK_FIELDS = ("Name", "Image", "ContentTypeName")
+
+class StringTable:
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def ref(self, value):
+        if value is None:
+            return NO_STRING
+        ref = self.index.get(value)
+        if ref is None:
+            ref = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return ref
+
+def build_compact_quests(quests_array, fields=QUEST_FIELDS):
+    # fields selects the quest columns to keep, see quest_shards.py
+    strings = StringTable()
+    quests = {field: [] for field in fields}
+    unlocks = {field: [] for field in UNLOCK_FIELDS}
+    unlock_rows = {}  # (Name, Image, ContentTypeName) -> unlock row
+    expansions = []
+
+    for expansion in quests_array:
+        groups = []
+        for group, group_quests in expansion["quests"].items():
+            groups.append([strings.ref(group), len(quests["#"]), len(group_quests)])
+            for quest in group_quests:
+                for field in fields:
+                    value = quest[field]
+                    if field in QUEST_STRING_FIELDS:
+                        value = strings.ref(value)
+                    elif field == "Unlocks":
+                        value = [get_unlock_row(unlock, unlocks, unlock_rows, strings) for unlock in value]
+                    quests[field].append(value)
+        expansions.append([strings.ref(expansion["name"]), groups])
+
+    return {
+        "version": COMPACT_FORMAT_VERSION,
+        "strings": strings.strings,
+        "expansions": expansions,
+        "quests": quests,
+        "unlocks": unlocks,
+    }
+
+def get_unlock_row(unlock, unlocks, unlock_rows, strings):
+    key = tuple(unlock[field] for field in UNLOCK_FIELDS)
+    row = unlock_rows.get(key)
+    if row is None:
+        row = unlock_rows[key] = len(unlocks["Name"])
+        for field, value in zip(UNLOCK_FIELDS, key):
+            unlocks[field].append(strings.ref(value))
+    return row
+
+def expand_compact_quests(compact):
+    strings = compact["strings"]
+    quests = compact["quests"]
+    unlocks = compact["unlocks"]
+
+    def string(ref):
+        return strings[ref] if ref != NO_STRING else None
+
+    def expand_unlock(row):
+        return {field: string(unlocks[field][row]) for field in UNLOCK_FIELDS}
+
+    def expand_quest(row):
+        quest = {}
+        for field in QUEST_FIELDS:
+            if field not in quests:
+                continue
+            value = quests[field][row]
+            if field in QUEST_STRING_FIELDS:
+                value = string(value)
+            elif field == "Unlocks":
+                value = [expand_unlock(unlock_row) for unlock_row in value]
+            quest[field] = value
+        return quest
+
+    return [
+        {
+            "name": string(name),
+            "quests": {
+                string(group): [expand_quest(row) for row in range(first_row, first_row + count)]
+                for group, first_row, count in groups
+            },
+        }
+        for name, groups in compact["expansions"]
+    ]
+
+def dump_compact(value):
+    # Keys must be strings, orjson refuses anything else
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def compress(data, extension):
+    # gzip gets a fixed mtime so unchanged data gives byte-identical files
+    if extension == "gz":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return brotli.compress(data, quality=11)
+
+def write_precompressed(path, data):
+    # Writes data plus .gz and, with brotli installed, .br copies of it, all atomically.
+    # The copies are written first and only compressed again if data changed, so they
+    # never lag behind a file that is already up to date
+    extensions = ["gz"] if brotli is None else ["gz", "br"]
+    unchanged = has_contents(path, data)
+    if brotli is None and os.path.exists(f"{path}.br"):
+        # Left by a run with brotli installed, it would no longer match data
+        os.remove(f"{path}.br")
+    sizes = {"json": len(data)}
+    for extension in extensions:
+        compressed_path = f"{path}.{extension}"
+        if not unchanged or not os.path.exists(compressed_path):
+            write_atomic(compressed_path, compress(data, extension))
+        sizes[extension] = os.path.getsize(compressed_path)
+    write_atomic(path, data)
+    return sizes
+
+"""
+    Quests.json
+"""
+
+def iter_quests_json(quests_array):
+    # The bytes of json.dump(quests_array, indent=4), one expansion at a time
+    if not quests_array:
+        yield b"[]"
+        return
+    yield b"["
+    for position, expansion in enumerate(quests_array):
+        # Strings escape their line breaks, every line break here is indentation
+        text = json.dumps(expansion, indent=4).replace("\n", "\n    ")
+        yield f"{',' if position else ''}\n    {text}".encode("utf-8")
+    yield b"\n]"
+
+def write_quests_json(quests_array, path):
+    # Streams Quests.json into place, returns False if it was already up to date
+    with AtomicFile(path) as json_file:
+        for chunk in iter_quests_json(quests_array):
+            json_file.write(chunk)
+    logging.info(
+        f"Quests written to {path}: {json_file.size / 1024:.1f} KB"
+        + ("." if json_file.changed else ", unchanged since the last build.")
+    )
+    return json_file.changed
+
+def write_compact_quests(quests_array, path):
+    sizes = write_precompressed(path, dump_compact(build_compact_quests(quests_array)))
+    logging.info(
+        f"Compact quests written to {path}: "
+        + ", ".join(f"{extension} {size / 1024:.1f} KB" for extension, size in sizes.items())
+    )
+    return sizes
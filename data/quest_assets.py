@@ -0,0 +1,141 @@
+import hashlib
+import importlib.util
+import io
+import os
+import re
+
+import logging
+
+from parse_pool import ParsePool
+from output_files import write_atomic
+
+"""
+    Local image assets
+
+    Quest and unlock images are XIVAPI texture paths, which the app would otherwise turn into
+    one beta.xivapi.com request per quest. Every distinct path is downloaded once, turned
+    into a WebP thumbnail and stored as assets/<hash>.webp, the image fields then point at
+    that file instead. Downloads run on the fetcher's threads, the conversion on the parse
+    pool's processes. Paths that fail to download or convert keep their XIVAPI path.
+
+    Local paths in the input, e.g. quests reused by an incremental run, are left alone.
+    The thumbnails are kept in memory until the build is emitted, so a run stopped by
+    validation leaves assets_dir as it was. Files no longer referenced by any quest are
+    then removed.
+"""
+
+LOCAL_ASSET_PREFIX = "assets/"  # Image fields starting with this are served by the app itself
+PLACEHOLDER_IMAGE_MARKER = "000000_hr1"  # XIVAPI's empty icon, the app shows its own placeholder
+THUMBNAIL_SIZE = (352, 128)  # Shown at 176x64 CSS pixels, twice that for high density screens
+THUMBNAIL_WEBP_QUALITY = 80
+ASSET_HASH_LENGTH = 12
+ASSET_FILE_NAME_PATTERN = re.compile(r"^[0-9a-f]{12}\.(webp|png)$")
+
+def is_remote_image_path(path):
+    return bool(path) and not path.startswith(LOCAL_ASSET_PREFIX) and PLACEHOLDER_IMAGE_MARKER not in path
+
+def iter_image_holders(quests_by_expansion):
+    # Every dict with an "Image" field, quests and their unlocks
+    for groups in quests_by_expansion.values():
+        for group_quests in groups.values():
+            for quest in group_quests:
+                yield quest
+                yield from quest["Unlocks"]
+
+def make_thumbnail(data):
+    # Returns the thumbnail bytes and their file extension
+    try:
+        from PIL import Image
+    except ImportError:  # Optional, images are kept as PNG at full size without it
+        return data, "png"
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGBA")
+        image.thumbnail(THUMBNAIL_SIZE)
+        output = io.BytesIO()
+        image.save(output, "WEBP", quality=THUMBNAIL_WEBP_QUALITY, method=6)
+        return output.getvalue(), "webp"
+
+def try_make_thumbnail(data):
+    # Runs in a parse worker, errors are returned so one broken image does not fail the batch
+    try:
+        return (*make_thumbnail(data), None)
+    except Exception as e:
+        return None, None, str(e)
+
+def store_asset(assets_dir, file_name, thumbnail):
+    path = os.path.join(assets_dir, file_name)
+    # The name is a hash of the contents, an existing file is already up to date
+    if not os.path.exists(path):
+        write_atomic(path, thumbnail)
+
+class ImageAssets:
+    # The thumbnails a build refers to, written by write() and cleaned up by prune()
+    def __init__(self, image_count):
+        self.image_count = image_count  # Distinct remote paths that were bundled
+        self.local_paths = {}  # XIVAPI path -> assets/<file name>
+        self.thumbnails = {}  # File name -> bytes, for the files converted by this run
+        self.referenced_files = set()  # Every file name the quests point at
+
+    def write(self, assets_dir):
+        os.makedirs(assets_dir, exist_ok=True)
+        for file_name, thumbnail in self.thumbnails.items():
+            store_asset(assets_dir, file_name, thumbnail)
+
+    def prune(self, assets_dir):
+        stale_files = [
+            file_name
+            for file_name in os.listdir(assets_dir)
+            if ASSET_FILE_NAME_PATTERN.match(file_name) and file_name not in self.referenced_files
+        ]
+        for file_name in stale_files:
+            os.remove(os.path.join(assets_dir, file_name))
+
+        logging.info(
+            f"Bundled {len(self.local_paths)}/{self.image_count} images into {assets_dir}, {len(self.referenced_files)} files in use, removed {len(stale_files)} stale files."
+        )
+
+def get_asset_file_name(thumbnail, extension):
+    return f"{hashlib.sha256(thumbnail).hexdigest()[:ASSET_HASH_LENGTH]}.{extension}"
+
+def bundle_image_assets(quests_by_expansion, sources, parse_pool=None):
+    # Points the image fields at local thumbnails, returns the ImageAssets to write
+    if importlib.util.find_spec("PIL") is None:
+        logging.warning("Pillow is not installed, storing images as full size PNG.")
+
+    image_paths = sorted(
+        {
+            holder["Image"]
+            for holder in iter_image_holders(quests_by_expansion)
+            if is_remote_image_path(holder["Image"])
+        }
+    )
+
+    def fetch(image_path):
+        with sources.fetcher.kind("assets"):
+            return sources.fetch_asset(image_path)
+
+    # Each distinct path is downloaded once, concurrently, then converted on every core
+    downloads = [
+        (image_path, data)
+        for image_path, data in zip(image_paths, sources.fetcher.map(fetch, image_paths))
+        if data is not None
+    ]
+    thumbnails = (parse_pool or ParsePool(max_workers=1)).map(
+        try_make_thumbnail, [data for _, data in downloads]
+    )
+
+    assets = ImageAssets(len(image_paths))
+    for (image_path, _), (thumbnail, extension, error) in zip(downloads, thumbnails):
+        if error is not None:
+            logging.warning(f"Failed to convert image {image_path}: {error}")
+            continue
+        file_name = get_asset_file_name(thumbnail, extension)
+        assets.thumbnails[file_name] = thumbnail
+        assets.local_paths[image_path] = f"{LOCAL_ASSET_PREFIX}{file_name}"
+
+    for holder in iter_image_holders(quests_by_expansion):
+        image_path = assets.local_paths.get(holder["Image"], holder["Image"])
+        holder["Image"] = image_path
+        if image_path and image_path.startswith(LOCAL_ASSET_PREFIX):
+            assets.referenced_files.add(image_path[len(LOCAL_ASSET_PREFIX) :])
+    return assets
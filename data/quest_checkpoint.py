@@ -0,0 +1,107 @@
+import json
+import os
+import time
+
+import logging
+
+"""
+    Enrichment checkpoint
+
+    An append-only JSONL journal of the quests enriched so far, so a run that dies halfway
+    can be resumed with --resume instead of fetching everything again:
+
+    {"version": 2, "enrichment": {"images": true, ...}}
+    {"#": 66209, "Hash": "...", "Image": "...", "Description": "...", "Unlocks": [...]}
+    ...
+
+    Only what enrichment fetched is stored, together with the row hash it was fetched for.
+    Quests with a fetch that failed are not recorded, a resumed run fetches them again.
+    A resumed run reuses a record only if the quest's row hash and the enrichment options
+    still match. A torn last line, from a run killed mid-write, is ignored. The file is
+    deleted once a run completes.
+"""
+
+CHECKPOINT_VERSION = 2  # Version 1 also recorded quests with failed fetches
+CHECKPOINT_FIELDS = ("Image", "Description", "Unlocks")
+CHECKPOINT_FLUSH_SECONDS = 5  # Records are synced to disk at most this long after being written
+
+def load_checkpoint(path, row_hashes, enrichment_options):
+    # Returns quest number -> enriched fields for every record that is still valid
+    if not os.path.exists(path):
+        return {}
+
+    records = {}
+    with open(path, encoding="utf-8") as checkpoint_file:
+        lines = checkpoint_file.read().splitlines()
+    if not lines:
+        return {}
+    try:
+        header = json.loads(lines[0])
+    except json.JSONDecodeError:
+        header = {}
+    if header.get("version") != CHECKPOINT_VERSION:
+        logging.warning(f"Ignoring checkpoint {path} with unknown version.")
+        return {}
+    if header.get("enrichment") != enrichment_options:
+        logging.info("Enrichment options changed since the checkpoint, not resuming.")
+        return {}
+
+    for line_number, line in enumerate(lines[1:], start=2):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            if line_number < len(lines):
+                logging.warning(f"Skipping corrupt line {line_number} of checkpoint {path}.")
+            continue
+        if row_hashes.get(record["#"]) == record["Hash"]:
+            records[record["#"]] = record
+    return records
+
+class QuestCheckpoint:
+    def __init__(self, path, enrichment_options):
+        self.path = path
+        self.enrichment_options = enrichment_options
+        self.checkpoint_file = None
+        self.synced_at = time.monotonic()
+
+    def load(self, row_hashes):
+        records = load_checkpoint(self.path, row_hashes, self.enrichment_options)
+        if records:
+            logging.info(f"Resuming {len(records)} quests from checkpoint {self.path}.")
+        else:
+            logging.info(f"Nothing to resume from checkpoint {self.path}.")
+        return records
+
+    def open(self, records=None):
+        # Starts a new journal holding the given records, later records are appended to it
+        self.checkpoint_file = open(self.path, "w", encoding="utf-8")
+        self.write_line({"version": CHECKPOINT_VERSION, "enrichment": self.enrichment_options})
+        for record in (records or {}).values():
+            self.write_line(record)
+        self.sync()
+
+    def record(self, quest, row_hash):
+        record = {"#": quest["#"], "Hash": row_hash}
+        record.update((field, quest[field]) for field in CHECKPOINT_FIELDS)
+        self.write_line(record)
+        if time.monotonic() - self.synced_at >= CHECKPOINT_FLUSH_SECONDS:
+            self.sync()
+
+    def write_line(self, value):
+        self.checkpoint_file.write(json.dumps(value, ensure_ascii=False) + "\n")
+
+    def sync(self):
+        self.checkpoint_file.flush()
+        os.fsync(self.checkpoint_file.fileno())
+        self.synced_at = time.monotonic()
+
+    def close(self):
+        if self.checkpoint_file is not None:
+            self.sync()
+            self.checkpoint_file.close()
+            self.checkpoint_file = None
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
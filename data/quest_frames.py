@@ -0,0 +1,246 @@
+import pandas as pd
+import json
+import hashlib
+import time
+import io
+import csv
+import numpy as np
+
+from io import StringIO
+
+import logging
+
+"""
+    Constants
+"""
+
+# Quest.csv is read in chunks and only these columns are kept, everything else is skipped
+QUEST_CSV_CHUNK_SIZE = 4096
+QUEST_CSV_DTYPES = {
+    "#": "int32",
+    "Id": "object",
+    "Name": "object",
+    "Expansion": "Int16",
+    "EventIconType": "Int16",
+}
+QUEST_CSV_DTYPES_BY_PREFIX = {
+    "PreviousQuest[": "Int32",
+    "QuestParams[": None,  # .ScriptInstruction stays text, .ScriptArg is numeric
+}
+
+# Quest.csv columns that feed a quest record, a change in any of them re-enriches the quest
+QUEST_HASH_COLUMNS = ("#", "Id", "Name", "Expansion", "EventIconType")
+QUEST_HASH_COLUMN_PREFIXES = ("PreviousQuest[", "QuestParams[")
+
+"""
+    Functions: Reading CSVs
+"""
+
+def pd_read_mapping(csv_content, key_column, value_column):
+    data = pd.read_csv(StringIO(csv_content))
+    return dict(zip(data[key_column].tolist(), data[value_column].tolist()))
+
+def get_quest_csv_columns(header):
+    # Returns the positions, names and dtypes of the Quest.csv columns the pipeline uses,
+    # the penultimate column is the obsolete flag
+    obsolete_position = len(header) - 2
+    selected = []
+    for position, column in enumerate(header):
+        if column in QUEST_CSV_DTYPES:
+            selected.append((position, column, QUEST_CSV_DTYPES[column]))
+        elif column.startswith("PreviousQuest["):
+            selected.append((position, column, QUEST_CSV_DTYPES_BY_PREFIX["PreviousQuest["]))
+        elif column.startswith("QuestParams["):
+            dtype = "Int64" if column.endswith(".ScriptArg") else "object"
+            selected.append((position, column, dtype))
+        elif position == obsolete_position:
+            selected.append((position, column, "boolean"))
+    return selected, header[obsolete_position]
+
+def pd_read_quest_csv_chunks(stream):
+    # Parses Quest.csv straight from a binary stream, one chunk at a time, keeping only
+    # the used columns. The obsolete flag is renamed to "IsObsolete"
+    started_at = time.perf_counter()
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    header = next(csv.reader([text_stream.readline()]))
+    selected, obsolete_column = get_quest_csv_columns(header)
+
+    total_rows = 0
+    for chunk in pd.read_csv(
+        text_stream,
+        header=None,
+        usecols=[position for position, _, _ in selected],
+        names=[column for _, column, _ in selected],
+        dtype={column: dtype for _, column, dtype in selected},
+        chunksize=QUEST_CSV_CHUNK_SIZE,
+    ):
+        total_rows += len(chunk)
+        yield chunk.rename(columns={obsolete_column: "IsObsolete"})
+
+    logging.info(
+        f"Read {total_rows} rows and {len(selected)}/{len(header)} columns of Quest.csv in {time.perf_counter() - started_at:.3f}s."
+    )
+
+def pd_read_quest_names(stream, quest_numbers):
+    # Reads only the "#" and Name columns of a streamed Quest.csv, for the given quests
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    quest_names = {}
+    for chunk in pd.read_csv(
+        text_stream,
+        usecols=["#", "Name"],
+        dtype={"#": QUEST_CSV_DTYPES["#"], "Name": QUEST_CSV_DTYPES["Name"]},
+        chunksize=QUEST_CSV_CHUNK_SIZE,
+    ):
+        chunk = chunk[chunk["#"].isin(quest_numbers)].dropna(subset=["Name"])
+        quest_names.update(zip(chunk["#"].tolist(), chunk["Name"].tolist()))
+    return quest_names
+
+def pd_filter_msq_quest_data(chunks):
+    # Keeps the non-obsolete Main Scenario Quests of every chunk
+    filtered_chunks = []
+    for chunk in chunks:
+        # Drop rows where 'Name' column has NaN values
+        chunk = chunk.dropna(subset=["Name"])
+        # Filter to keep rows where EventIconType is 3 which represents Main Scenario Quests
+        chunk = chunk[chunk["EventIconType"].eq(3).fillna(False)]
+        # Filter out obsolete quests
+        chunk = chunk[chunk["IsObsolete"].eq(False).fillna(False)]
+        filtered_chunks.append(chunk)
+
+    quest_data = pd.concat(filtered_chunks, ignore_index=True)
+    logging.info(f"Kept {len(quest_data)} MSQ rows.")
+    return quest_data
+
+"""
+    Functions: Extracting quest rows
+"""
+
+def pd_get_previous_quests(quest_data):
+    # One list per row, filled column by column so PreviousQuest[0] stays first
+    previous_quests = [[] for _ in range(len(quest_data))]
+    for i in range(3):
+        column = pd.to_numeric(quest_data[f"PreviousQuest[{i}]"], errors="coerce")
+        valid = column.notna() & (column != 0)
+        for position, previous_quest in zip(
+            np.flatnonzero(valid.to_numpy(dtype=bool)),
+            column[valid].astype("int64").tolist(),
+        ):
+            previous_quests[position].append(previous_quest)
+    return previous_quests
+
+def pd_get_unlock_instance_ids(quest_data, instance_content_mapping):
+    # Stack every QuestParams[n] instruction/arg pair into one long frame, row-major so
+    # each quest's params keep their column order
+    param_indices = [
+        int(column[len("QuestParams[") : column.index("]")])
+        for column in quest_data.columns
+        if column.startswith("QuestParams[")
+        and column.endswith("].ScriptInstruction")
+        and column.replace("ScriptInstruction", "ScriptArg") in quest_data.columns
+    ]
+    unlock_instance_ids = [[] for _ in range(len(quest_data))]
+    if not param_indices:
+        return unlock_instance_ids
+
+    instructions = quest_data[
+        [f"QuestParams[{i}].ScriptInstruction" for i in param_indices]
+    ].to_numpy(dtype=object)
+    arguments = quest_data[[f"QuestParams[{i}].ScriptArg" for i in param_indices]]
+    params = pd.DataFrame(
+        {
+            "position": np.repeat(np.arange(len(quest_data)), len(param_indices)),
+            "instruction": pd.Series(instructions.ravel(), dtype=object),
+            "arg": pd.to_numeric(
+                pd.Series(arguments.to_numpy(dtype=object).ravel()), errors="coerce"
+            ),
+        }
+    )
+
+    # Keep "INSTANCEDUNGEON" instructions with a non-empty, non-zero instance ID
+    is_unlock = (
+        params["instruction"].astype(str).str.contains("INSTANCEDUNGEON", regex=False)
+        & params["instruction"].notna()
+        & params["arg"].notna()
+        & (params["arg"] != 0)
+    )
+    unlocks = params[is_unlock]
+
+    # Lookup the final IDs using the mapping
+    final_ids = unlocks["arg"].astype("int64").map(instance_content_mapping)
+    missing = unlocks["arg"][final_ids.isna() | (final_ids == 0)].astype("int64")
+    for instance_id in missing.unique().tolist():
+        logging.warning(
+            f"Instance ID {instance_id} not found in instance content mapping."
+        )
+
+    found = final_ids.notna() & (final_ids != 0)
+    for position, final_id in zip(
+        unlocks["position"][found].tolist(), final_ids[found].astype("int64").tolist()
+    ):
+        unlock_instance_ids[position].append(final_id)
+    return unlock_instance_ids
+
+def pd_get_quest_rows(quest_data, instance_content_mapping):
+    # Extract everything the enrichment stage needs as plain Python records
+    started_at = time.perf_counter()
+    quest_rows = quest_data[["#", "Id", "Name", "Expansion", "EventIconType"]].to_dict(
+        "records"
+    )
+    row_hashes = pd_get_quest_row_hashes(quest_data)
+    for quest_row, previous_quests, unlock_instance_ids, row_hash in zip(
+        quest_rows,
+        pd_get_previous_quests(quest_data),
+        pd_get_unlock_instance_ids(quest_data, instance_content_mapping),
+        row_hashes,
+    ):
+        quest_row["#"] = int(quest_row["#"])
+        quest_row["PreviousQuests"] = previous_quests
+        quest_row["UnlockInstanceIds"] = unlock_instance_ids
+        quest_row["Hash"] = row_hash
+    logging.info(
+        f"Extracted {len(quest_rows)} quest rows in {time.perf_counter() - started_at:.3f}s."
+    )
+    return quest_rows
+
+"""
+    Functions: Row hashes
+"""
+
+def normalize_cell(value):
+    if pd.isna(value):
+        return ""
+    # Integer columns with gaps are parsed as floats, hash 65575.0 and 65575 the same
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def pd_normalize_column(column):
+    if pd.api.types.is_float_dtype(column):
+        normalized = column.astype(str)
+        is_integer = column.notna() & (column % 1 == 0)
+        normalized[is_integer] = column[is_integer].astype("int64").astype(str)
+        normalized[column.isna()] = ""
+        return normalized
+    if pd.api.types.is_integer_dtype(column) or pd.api.types.is_bool_dtype(column):
+        normalized = column.astype(str)
+        normalized[column.isna()] = ""
+        return normalized
+    return column.map(normalize_cell)
+
+def pd_get_quest_row_hashes(quest_data):
+    hash_columns = get_quest_hash_columns(quest_data.columns)
+    normalized = pd.DataFrame(
+        {column: pd_normalize_column(quest_data[column]) for column in hash_columns}
+    )
+    return [
+        hashlib.sha1(json.dumps(values).encode("utf-8")).hexdigest()
+        for values in normalized.to_numpy(dtype=object).tolist()
+    ]
+
+def get_quest_hash_columns(columns):
+    return [
+        column
+        for column in columns
+        if column in QUEST_HASH_COLUMNS
+        or column.startswith(QUEST_HASH_COLUMN_PREFIXES)
+    ]
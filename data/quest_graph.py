@@ -0,0 +1,125 @@
+from collections import deque
+
+import logging
+
+"""
+    Quest graph
+
+    The MSQ graph built once from PreviousQuests. Quests are nodes 0..n-1 in ascending quest
+    number order, edges are kept as index lists in both directions:
+      predecessors[i]  nodes listed in PreviousQuests of i, in column order
+      successors[i]    nodes that list i in their PreviousQuests, in ascending order
+      next_msq[i]      the successor that becomes NextMSQ, -1 for none
+
+    When a quest has several successors the one with the highest quest number is its NextMSQ,
+    whatever the row order of Quest.csv is. Every method is a single O(V+E) pass or less.
+"""
+
+NO_NODE = -1
+
+class QuestGraph:
+    def __init__(self, quests_by_number):
+        self.numbers = sorted(quests_by_number)
+        self.quests = [quests_by_number[number] for number in self.numbers]
+        self.index = {number: i for i, number in enumerate(self.numbers)}
+        self.predecessors = [[] for _ in self.numbers]
+        self.successors = [[] for _ in self.numbers]
+
+        for i, quest in enumerate(self.quests):
+            for previous_quest_number in quest["PreviousQuests"]:
+                j = self.index.get(previous_quest_number)
+                if j is not None:
+                    self.predecessors[i].append(j)
+                    self.successors[j].append(i)
+
+        self.next_msq = [
+            successors[-1] if successors else NO_NODE for successors in self.successors
+        ]
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def next_msq_number(self, quest_number):
+        next_node = self.next_msq[self.index[quest_number]]
+        return self.numbers[next_node] if next_node != NO_NODE else None
+
+    def nodes_of(self, quests):
+        return [self.index[quest["#"]] for quest in quests]
+
+    def walk_back(self, start_node):
+        # Follows the first MSQ predecessor from start_node, stops at the first quest it has seen
+        path = []
+        seen = set()
+        node = start_node
+        while node != NO_NODE:
+            if node in seen:
+                logging.warning(
+                    f"PreviousQuests of quest {self.numbers[node]} loop back onto itself, stopping the walk."
+                )
+                break
+            seen.add(node)
+            path.append(node)
+
+            # Move to the first available previous quest that is also an MSQ (EventIconType == 3)
+            node = next(
+                (
+                    previous_node
+                    for previous_node in self.predecessors[node]
+                    if self.quests[previous_node].get("EventIconType") == 3
+                ),
+                NO_NODE,
+            )
+        return path
+
+    def topological_order(self):
+        # Kahn's algorithm over PreviousQuests edges, ready nodes leave in quest number order.
+        # Returns the order and the nodes left on or behind a cycle
+        in_degree = [len(predecessors) for predecessors in self.predecessors]
+        ready = deque(node for node, degree in enumerate(in_degree) if degree == 0)
+        order = []
+        while ready:
+            node = ready.popleft()
+            order.append(node)
+            for successor in self.successors[node]:
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0:
+                    ready.append(successor)
+
+        cyclic = [node for node, degree in enumerate(in_degree) if degree > 0]
+        return order, cyclic
+
+    def reachable(self, start_node, nodes):
+        # Nodes of the given set reached by following NextMSQ from start_node
+        members = set(nodes)
+        visited = set()
+        node = start_node
+        while node in members and node not in visited:
+            visited.add(node)
+            node = self.next_msq[node]
+        return visited
+
+    def chain_order(self, nodes):
+        # Orders a group by following NextMSQ from every start node, the nodes no other node
+        # of the group points to, in quest number order. Returns the order, the start nodes and
+        # the nodes only reachable through a cycle
+        members = set(nodes)
+        has_previous = set()
+        for node in nodes:
+            if self.next_msq[node] in members:
+                has_previous.add(self.next_msq[node])
+        start_nodes = sorted(node for node in members if node not in has_previous)
+
+        order = []
+        processed = set()
+        for start_node in start_nodes:
+            node = start_node
+            while node in members:
+                if node in processed:
+                    logging.info(f"Skipping duplicate quest ID {self.numbers[node]}.")
+                    break
+                order.append(node)
+                processed.add(node)
+                node = self.next_msq[node]
+
+        cyclic = sorted(members - processed)
+        return order, start_nodes, cyclic
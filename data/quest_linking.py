@@ -0,0 +1,179 @@
+import logging
+
+from quest_graph import NO_NODE
+
+"""
+    Constants
+"""
+
+QUEST_GROUP_GRIDANIA = "Gridania"
+QUEST_GROUP_ULDAH = "Ul'dah"
+QUEST_GROUP_LIMSA_LOMINSA = "Limsa Lominsa"
+QUEST_GROUP_MAIN_QUEST_LINE = "Main Quest Line"
+QUEST_GROUPS = [
+    QUEST_GROUP_GRIDANIA,
+    QUEST_GROUP_ULDAH,
+    QUEST_GROUP_LIMSA_LOMINSA,
+    QUEST_GROUP_MAIN_QUEST_LINE,
+]
+
+ENVOY_TO_QUEST_GROUP = {
+    66064: QUEST_GROUP_ULDAH,
+    66082: QUEST_GROUP_LIMSA_LOMINSA,
+    66043: QUEST_GROUP_GRIDANIA,
+}
+
+CONVERGING_QUEST_ID = 66209 # The quest where the ARR main quest line converges and starts
+STARTING_QUEST_IDS = [
+    # IDs for the "Close to Home" quests in Gridania, Ul'dah, and Limsa Lominsa
+    65621,
+    66104,
+    65644,
+]
+
+"""
+    Functions: Linking
+"""
+
+def get_expansion_name(expansion_index, expansion_mapping):
+    return expansion_mapping.get(expansion_index, "Unknown")
+
+def assign_quest_groups(quests_by_number, graph):
+    # Calculate ARR quest groups based on quests that lead to the envoy quests
+    envoy_quests = [quests_by_number[quest_number] for quest_number in ENVOY_TO_QUEST_GROUP.keys() if quest_number in quests_by_number]
+    if not envoy_quests:
+        raise ValueError("No envoy quests found in quests by number.")
+    for envoy_quest in envoy_quests:
+        quest_number = envoy_quest["#"]
+        group = ENVOY_TO_QUEST_GROUP.get(quest_number)
+        logging.info(
+            f"\nAssigning quest group '{group}' by traversing backwards from '{envoy_quest['Name']}' with ID: {envoy_quest['#']}"
+        )
+        for node in graph.walk_back(graph.index[quest_number]):
+            current_quest = graph.quests[node]
+            logging.info(
+                f"Assigning '{group}' to quest: {current_quest['Name']}, ID: {current_quest['#']}"
+            )
+            current_quest["QuestGroup"] = group
+
+def link_next_msq(graph):
+    # Build a linked list of quests based on the NextMSQ field
+    for quest, next_node in zip(graph.quests, graph.next_msq):
+        if next_node != NO_NODE:
+            quest["NextMSQ"] = graph.numbers[next_node]
+
+def filter_quests_without_next_msq(quests_by_number):
+    # Remove quests that do not have a NextMSQ but are not final quests,
+    # but keep the quest with the highest # number.
+    max_quest_id = max(quests_by_number.keys())
+    quests_by_number = {
+        quest_id: quest
+        for quest_id, quest in quests_by_number.items()
+        if quest["NextMSQ"] or quest_id == max_quest_id
+    }
+    logging.info(f"After filtering no NextMSQ, {len(quests_by_number)} quests remain.")
+    return quests_by_number
+
+def log_cycles(graph):
+    _, cyclic = graph.topological_order()
+    if cyclic:
+        logging.warning(
+            f"{len(cyclic)} quests are on or behind a PreviousQuests cycle: {[graph.numbers[node] for node in cyclic[:10]]}"
+        )
+
+"""
+    Functions: Ordering
+"""
+
+def group_quests_by_expansion(quests_by_number):
+    # Structure:
+    # {
+    #   "A Realm Reborn": {
+    #       "Gridania": [quests],
+    #       "Ul'dah": [quests],
+    #       "Limsa Lominsa": [quests],
+    #       "Main Quest Line": [quests]
+    #   },
+    #   "Heavensward": {
+    #       "Main Quest Line": [quests]
+    #   },
+    #   ... and so on
+    # }
+    quests_by_expansion = {}
+    for quest in quests_by_number.values():
+        expansion = quest["ExpansionName"]
+        quest_group = (
+            quest["QuestGroup"] if quest["QuestGroup"] else QUEST_GROUP_MAIN_QUEST_LINE
+        )
+        if expansion not in quests_by_expansion:
+            quests_by_expansion[expansion] = {}
+        if quest_group not in quests_by_expansion[expansion]:
+            quests_by_expansion[expansion][quest_group] = []
+        quests_by_expansion[expansion][quest_group].append(quest)
+    return quests_by_expansion
+
+def filter_unvisited_quests(quests, graph, start_quest_id=CONVERGING_QUEST_ID):
+    # Keep only the quests reachable through NextMSQ from the start quest
+    nodes = graph.nodes_of(quests)
+    visited = graph.reachable(graph.index.get(start_quest_id, NO_NODE), nodes)
+    return [quest for quest, node in zip(quests, nodes) if node in visited]
+
+def order_quests_by_next_msq(quests, graph, group=None):
+    order, start_nodes, cyclic = graph.chain_order(graph.nodes_of(quests))
+    if not start_nodes:
+        logging.info(
+            f"No starting quest found for {group if group else QUEST_GROUP_MAIN_QUEST_LINE}. Skipping..."
+        )
+        return []
+    if cyclic:
+        logging.warning(
+            f"Leaving out {len(cyclic)} quests of {group} that are only reachable through a NextMSQ cycle: {[graph.numbers[node] for node in cyclic[:10]]}"
+        )
+    return [graph.quests[node] for node in order]
+
+def order_quest_groups(groups, quests_by_number, graph):
+    # Sort every ARR quest group, the city groups first, then the Main Quest Line
+    sorted_quests_by_group = {}
+    for group in QUEST_GROUPS:
+        group_quests = groups.get(group, [])
+        if group_quests:  # Only process if there are quests for this group
+            sorted_quests_by_group[group] = order_quests_by_next_msq(group_quests, graph, group)
+            validate_quest_order(sorted_quests_by_group[group], quests_by_number)
+
+    len_gridania = len(sorted_quests_by_group.get(QUEST_GROUP_GRIDANIA, []))
+    len_uldah = len(sorted_quests_by_group.get(QUEST_GROUP_ULDAH, []))
+    len_limsa_lominsa = len(sorted_quests_by_group.get(QUEST_GROUP_LIMSA_LOMINSA, []))
+    logging.info(
+        f"Sorted ARR quest group lengths: {QUEST_GROUP_GRIDANIA}: {len_gridania}, {QUEST_GROUP_ULDAH}: {len_uldah}, {QUEST_GROUP_LIMSA_LOMINSA}: {len_limsa_lominsa}"
+    )
+    logging.info(
+        f"Sorted ARR {QUEST_GROUP_MAIN_QUEST_LINE} quests length: {len(sorted_quests_by_group.get(QUEST_GROUP_MAIN_QUEST_LINE, []))}"
+    )
+    return sorted_quests_by_group
+
+def convert_quest_fields_to_numbers(quest):
+    # Important: CSV uses int32 for quest IDs, but for reasons the dump makes strings so we just convert them here
+    quest["#"] = int(quest["#"])
+    if quest["NextMSQ"] is not None:
+        quest["NextMSQ"] = int(quest["NextMSQ"])
+    quest["PreviousQuests"] = [int(q) for q in quest["PreviousQuests"]]
+
+"""
+    Functions: Validation
+"""
+
+# Function to validate the order of quests based on the NextMSQ field
+def validate_quest_order(sorted_quests, quests_by_number):
+    for i in range(len(sorted_quests) - 1):
+        current_quest = sorted_quests[i]
+        next_quest = sorted_quests[i + 1]
+
+        # Validate that the current quest's NextMSQ is the next quest in the sorted list
+        if current_quest["NextMSQ"] != next_quest["#"]:
+            expected_next = quests_by_number.get(current_quest["NextMSQ"], {}).get(
+                "Name", "Unknown"
+            )
+            logging.warning(
+                f"❌ Order issue: '{current_quest['Name']}' (ID: {current_quest['#']}) should link to "
+                f"'{next_quest['Name']}' (ID: {next_quest['#']}), but links to '{expected_next}' instead."
+            )
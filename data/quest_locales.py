@@ -0,0 +1,244 @@
+import logging
+
+from quest_artifact import (
+    UNLOCK_FIELDS,
+    build_compact_quests,
+    dump_compact,
+    write_precompressed,
+)
+
+"""
+    Locales
+
+    Quests are built from the English data. Everything that does not depend on the language
+    (graph, order, groups, images, unlock IDs) is built once. Every other locale only fetches
+    its text:
+    - quest names from its Quest.csv
+    - expansion names from ExVersion.csv
+    - the first journal entry of every quest
+    - unlock names from XIVAPI, matched to the English unlocks by ContentFinderCondition ID
+    All locales share the fetcher's worker pool, so their requests run concurrently.
+
+    The compact artifact then gets one string table per locale. Strings are deduplicated by
+    their value in every locale, so all tables have the same length and order and share the
+    structure in Quests.compact.json:
+
+    static/Quests.compact.json            structure + English strings
+    static/Quests.strings.<locale>.json   {"version": 1, "locale": "ja", "strings": [...]}
+
+    Text missing in a locale falls back to English.
+"""
+
+SUPPORTED_LOCALES = ("ja", "de", "fr")  # Client languages besides English
+LOCALIZED_STRINGS_VERSION = 1
+LOCALIZED_QUEST_FIELDS = ("Name", "Description", "ExpansionName")
+LOCALIZED_UNLOCK_FIELDS = ("Name", "ContentTypeName")
+
+def get_unlock_key(unlock):
+    return tuple(unlock[field] for field in UNLOCK_FIELDS)
+
+class LocaleText:
+    # The text of one locale, keyed by what identifies it in the English build
+    def __init__(self, locale):
+        self.locale = locale
+        self.quest_names = {}  # Quest number -> name
+        self.descriptions = {}  # Quest number -> first journal entry
+        self.expansion_names = {}  # English name -> name
+        self.unlocks = {}  # ContentFinderCondition ID -> {Name, ContentTypeName, ...}
+        self.localized_unlocks = set()  # English unlocks localize_unlock() found a text for
+
+    def localize_quest(self, quest):
+        return {
+            "Name": self.quest_names.get(quest["#"]) or quest["Name"],
+            "Description": self.descriptions.get(quest["#"]) or quest["Description"],
+            "ExpansionName": self.localize_expansion(quest["ExpansionName"]),
+        }
+
+    def localize_expansion(self, name):
+        return self.expansion_names.get(name) or name
+
+    def localize_unlock(self, unlock, instance_id):
+        # instance_id is None when it is not known which instance the unlock was resolved from
+        localized_unlock = self.unlocks.get(instance_id, {})
+        if localized_unlock:
+            self.localized_unlocks.add(get_unlock_key(unlock))
+        return {
+            field: localized_unlock.get(field) or unlock[field]
+            for field in LOCALIZED_UNLOCK_FIELDS
+        }
+
+"""
+    Fetching
+"""
+
+def fetch_locale_tables(sources, quest_numbers, expansion_mapping, instance_ids):
+    # Quest, expansion and unlock names of one locale. expansion_mapping is the English one,
+    # the locale's names are matched to it by index
+    from quest_frames import pd_read_mapping, pd_read_quest_names
+
+    text = LocaleText(sources.locale)
+
+    csv_content = sources.fetch_csv("ExVersion.csv")
+    if csv_content is not None:
+        localized_mapping = pd_read_mapping(csv_content, "#", "Name")
+        text.expansion_names = {
+            name: localized_mapping.get(index) for index, name in expansion_mapping.items()
+        }
+    else:
+        logging.warning(f"Failed to download the {sources.locale} ExVersion.csv.")
+
+    response = sources.open_csv("Quest.csv")
+    if response is not None:
+        with response:
+            text.quest_names = pd_read_quest_names(response.raw, quest_numbers)
+    else:
+        logging.warning(f"Failed to download the {sources.locale} Quest.csv.")
+
+    text.unlocks = sources.fetch_instance_contents(sorted(instance_ids))
+
+    logging.info(
+        f"Fetched {sources.locale} names of {len(text.quest_names)}/{len(quest_numbers)} quests and {len(text.unlocks)}/{len(instance_ids)} unlocks."
+    )
+    return text
+
+def fetch_locale_texts(sources, locales, quests, expansion_mapping, instance_ids, journal_folder_index=None):
+    # Returns locale -> LocaleText for every locale, journal_folder_index is None to leave
+    # the descriptions in English
+    from tqdm import tqdm
+
+    locale_sources = [sources.for_locale(locale) for locale in locales]
+    quest_numbers = {quest["#"] for quest in quests}
+
+    texts = {}
+    for text in sources.fetcher.map(
+        lambda localized_sources: fetch_locale_tables(
+            localized_sources, quest_numbers, expansion_mapping, instance_ids
+        ),
+        locale_sources,
+    ):
+        texts[text.locale] = text
+
+    if journal_folder_index is not None:
+        # Every journal of every locale goes through the pool at once
+        journals = [
+            (localized_sources, quest)
+            for localized_sources in locale_sources
+            for quest in quests
+            if quest["Description"] is not None
+        ]
+
+        def fetch_journal(journal):
+            localized_sources, quest = journal
+            with sources.fetcher.kind("journal"):
+                return localized_sources.fetch_first_journal_entry(
+                    quest["Id"], journal_folder_index.get(quest["Id"])
+                )
+
+        with tqdm(total=len(journals), desc="Processing Locales", ncols=100) as pbar:
+            for (localized_sources, quest), journal_entry in zip(
+                journals, sources.fetcher.map(fetch_journal, journals)
+            ):
+                if journal_entry is not None:
+                    texts[localized_sources.locale].descriptions[quest["#"]] = journal_entry
+                pbar.update(1)
+
+    return texts
+
+"""
+    Emitting
+"""
+
+def get_localized_key(value, localized_values):
+    # Every locale's value of a string, None if it has none in English
+    if value is None:
+        return None
+    return (value, *localized_values)
+
+def zip_localized_quests(quests_array, texts, unlock_ids):
+    # A copy of quests_array whose strings are tuples of their English and localized values,
+    # so build_compact_quests() deduplicates them by their value in every locale. unlock_ids
+    # maps quest numbers to the ContentFinderCondition ID of each of their unlocks
+    localized_quests_array = []
+    for expansion in quests_array:
+        localized_groups = {}
+        for group, group_quests in expansion["quests"].items():
+            localized_group_quests = []
+            for quest in group_quests:
+                localized_quest = {
+                    field: get_localized_key(value, [value] * len(texts))
+                    if isinstance(value, str)
+                    else value
+                    for field, value in quest.items()
+                }
+                localized_texts = [text.localize_quest(quest) for text in texts]
+                for field in LOCALIZED_QUEST_FIELDS:
+                    localized_quest[field] = get_localized_key(
+                        quest[field], [localized_text[field] for localized_text in localized_texts]
+                    )
+                quest_unlock_ids = unlock_ids.get(quest["#"]) or [None] * len(quest["Unlocks"])
+                localized_quest["Unlocks"] = [
+                    zip_localized_unlock(unlock, instance_id, texts)
+                    for unlock, instance_id in zip(quest["Unlocks"], quest_unlock_ids)
+                ]
+                localized_group_quests.append(localized_quest)
+            localized_groups[get_localized_key(group, [group] * len(texts))] = localized_group_quests
+
+        localized_quests_array.append(
+            {
+                "name": get_localized_key(
+                    expansion["name"],
+                    [text.localize_expansion(expansion["name"]) for text in texts],
+                ),
+                "quests": localized_groups,
+            }
+        )
+    return localized_quests_array
+
+def zip_localized_unlock(unlock, instance_id, texts):
+    localized_unlocks = [text.localize_unlock(unlock, instance_id) for text in texts]
+    return {
+        field: get_localized_key(
+            unlock[field],
+            [
+                localized_unlock[field] if field in LOCALIZED_UNLOCK_FIELDS else unlock[field]
+                for localized_unlock in localized_unlocks
+            ],
+        )
+        for field in UNLOCK_FIELDS
+    }
+
+def write_localized_compact_quests(quests_array, texts, unlock_ids, path, localized_strings_path):
+    # Writes the compact artifact with the English strings and one string table per locale,
+    # localized_strings_path is formatted with the locale
+    texts = list(texts.values())
+    compact = build_compact_quests(zip_localized_quests(quests_array, texts, unlock_ids))
+    unlock_keys = {
+        get_unlock_key(unlock)
+        for expansion in quests_array
+        for group_quests in expansion["quests"].values()
+        for quest in group_quests
+        for unlock in quest["Unlocks"]
+    }
+    keys = compact["strings"]
+    compact["strings"] = [key[0] for key in keys]
+
+    sizes = write_precompressed(path, dump_compact(compact))
+    logging.info(
+        f"Compact quests written to {path}: "
+        + ", ".join(f"{extension} {size / 1024:.1f} KB" for extension, size in sizes.items())
+    )
+
+    for position, text in enumerate(texts, start=1):
+        strings_path = localized_strings_path.format(locale=text.locale)
+        localized_strings = {
+            "version": LOCALIZED_STRINGS_VERSION,
+            "locale": text.locale,
+            "strings": [key[position] for key in keys],
+        }
+        sizes = write_precompressed(strings_path, dump_compact(localized_strings))
+        logging.info(
+            f"{text.locale} strings written to {strings_path}: "
+            + ", ".join(f"{extension} {size / 1024:.1f} KB" for extension, size in sizes.items())
+            + f", {len(text.localized_unlocks)}/{len(unlock_keys)} unlocks localized."
+        )
+    return compact
@@ -0,0 +1,77 @@
+import json
+import os
+
+import logging
+
+from output_files import write_atomic
+
+"""
+    Incremental rebuild
+
+    The manifest keeps the row hash of every quest of the last build, together with the
+    enrichment options it was built with. Quests whose hash is unchanged can reuse what the
+    last Quests.json fetched for them. Quests with a fetch that failed are not listed, so the
+    next run fetches them again instead of reusing the gap.
+"""
+
+MANIFEST_VERSION = 2  # Version 1 also listed quests with failed fetches
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get("version") != MANIFEST_VERSION:
+            logging.warning(f"Ignoring manifest {path} with unknown version.")
+            return None
+        return manifest
+    except Exception as e:
+        logging.warning(f"Failed to load manifest {path}: {e}")
+    return None
+
+def load_previous_quests(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as json_file:
+            quests_array = json.load(json_file)
+        return {
+            quest["#"]: quest
+            for expansion in quests_array
+            for group_quests in expansion["quests"].values()
+            for quest in group_quests
+        }
+    except Exception as e:
+        logging.warning(f"Failed to load previous quests from {path}: {e}")
+    return {}
+
+def get_reusable_quests(manifest_path, quests_json_path, row_hashes, enrichment_options):
+    # Quests whose row hash matches the last build and that made it into the last Quests.json
+    manifest = load_manifest(manifest_path)
+    if manifest is None:
+        logging.info("No usable manifest found, running a full rebuild.")
+        return {}
+    if manifest.get("enrichment") != enrichment_options:
+        logging.info("Enrichment options changed since the last build, running a full rebuild.")
+        return {}
+
+    previous_hashes = manifest.get("quests", {})
+    previous_quests = load_previous_quests(quests_json_path)
+    return {
+        quest_number: previous_quests[quest_number]
+        for quest_number, row_hash in row_hashes.items()
+        if quest_number in previous_quests
+        and previous_hashes.get(str(quest_number)) == row_hash
+    }
+
+def write_manifest(path, row_hashes, enrichment_options):
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "enrichment": enrichment_options,
+        "quests": {
+            str(quest_number): row_hash
+            for quest_number, row_hash in sorted(row_hashes.items())
+        },
+    }
+    write_atomic(path, json.dumps(manifest, indent=1).encode("utf-8"))
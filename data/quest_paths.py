@@ -0,0 +1,18 @@
+"""
+    Output paths
+
+    Where the pipeline reads and writes its files, relative to the root of the repository.
+    Kept apart from quest_pipeline.py so the CLI can name them without importing the stages.
+"""
+
+OUTPUT_JSON_PATH = "static/Quests.json"
+COMPACT_JSON_PATH = "static/Quests.compact.json"  # Loaded by the app, see quest_artifact.py
+LOCALIZED_STRINGS_PATH = "static/Quests.strings.{locale}.json"  # String tables of Quests.compact.json, see quest_locales.py
+SEARCH_INDEX_JSON_PATH = "static/Quests.search.json"  # Prefix -> quest numbers, see quest_search.py
+POSITIONS_JSON_PATH = "static/Quests.positions.json"  # Quest number -> position in the order, see quest_positions.py
+SHARDS_DIR = "static/quests"  # One shard per expansion, see quest_shards.py. Not loaded by the app yet
+ASSETS_DIR = "static/assets"  # Local image thumbnails, see quest_assets.py
+PROFILE_JSON_PATH = "static/Quests.profile.json"  # Written when profiling is enabled
+MANIFEST_JSON_PATH = "data/Quests.manifest.json"  # Row hashes of the last build, used by incremental runs
+REPORT_JSON_PATH = "data/Quests.report.json"  # Validation issues and the diff with the previous build
+CHECKPOINT_PATH = "data/Quests.checkpoint.jsonl"  # Quests enriched by an unfinished run, used by --resume
@@ -0,0 +1,523 @@
+from memo import Memo
+from quest_graph import QuestGraph
+from profiling import Profiler
+from parse_pool import ParsePool
+from quest_artifact import write_compact_quests, write_quests_json
+from quest_search import write_search_index
+from quest_positions import write_quest_positions
+from quest_shards import write_quest_shards
+from quest_assets import bundle_image_assets
+from quest_manifest import get_reusable_quests, write_manifest
+from quest_checkpoint import QuestCheckpoint
+from quest_locales import fetch_locale_texts, write_localized_compact_quests
+from quest_linking import (
+    QUEST_GROUP_MAIN_QUEST_LINE,
+    CONVERGING_QUEST_ID,
+    get_expansion_name,
+    assign_quest_groups,
+    link_next_msq,
+    filter_quests_without_next_msq,
+    log_cycles,
+    group_quests_by_expansion,
+    filter_unvisited_quests,
+    order_quest_groups,
+    convert_quest_fields_to_numbers,
+)
+from quest_validation import validate_quest_build, load_previous_build, compare_with_previous_build
+from quest_paths import (
+    OUTPUT_JSON_PATH,
+    COMPACT_JSON_PATH,
+    LOCALIZED_STRINGS_PATH,
+    SEARCH_INDEX_JSON_PATH,
+    POSITIONS_JSON_PATH,
+    SHARDS_DIR,
+    ASSETS_DIR,
+    PROFILE_JSON_PATH,
+    MANIFEST_JSON_PATH,
+    REPORT_JSON_PATH,
+    CHECKPOINT_PATH,
+)
+
+import logging
+
+"""
+    Pipeline
+
+    load -> filter -> enrich -> link -> order -> assets -> localize -> validate -> emit
+
+    Every stage takes the output of the previous one and returns its own, so stages can be
+    run, timed or replaced one at a time. run() chains them all. load() keeps the expansion
+    and instance content mappings on the pipeline, the later stages read them from there.
+    pandas is only imported by the stages that parse CSVs and tqdm by the ones that show
+    progress, so the CLI's offline commands start fast. assets only runs when given an
+    assets_dir, localize only when given extra locales.
+"""
+
+class QuestPipeline:
+    def __init__(
+        self,
+        sources,
+        fetch_images=True,
+        fetch_journal_entries=True,
+        fetch_unlocks=True,
+        incremental=False,
+        resume=False,
+        strict=False,
+        output_json_path=OUTPUT_JSON_PATH,
+        compact_json_path=COMPACT_JSON_PATH,
+        search_index_json_path=SEARCH_INDEX_JSON_PATH,
+        positions_json_path=POSITIONS_JSON_PATH,
+        shards_dir=None,
+        split_details=False,
+        assets_dir=None,
+        locales=(),
+        localized_strings_path=LOCALIZED_STRINGS_PATH,
+        manifest_json_path=MANIFEST_JSON_PATH,
+        profile_json_path=PROFILE_JSON_PATH,
+        report_json_path=REPORT_JSON_PATH,
+        checkpoint_path=CHECKPOINT_PATH,
+        profiler=None,
+        parse_pool=None,
+    ):
+        self.sources = sources
+        self.fetcher = sources.fetcher
+        self.fetch_images = fetch_images
+        self.fetch_journal_entries = fetch_journal_entries
+        self.fetch_unlocks = fetch_unlocks
+        self.incremental = incremental
+        self.resume = resume
+        self.strict = strict  # Validation errors stop the run before anything is written
+        self.output_json_path = output_json_path
+        self.compact_json_path = compact_json_path  # None skips the compact artifact
+        self.search_index_json_path = search_index_json_path  # None skips the search index
+        self.positions_json_path = positions_json_path  # None skips the position tables
+        self.shards_dir = shards_dir  # None skips the shards
+        self.split_details = split_details
+        self.assets_dir = assets_dir  # None keeps the XIVAPI image paths
+        self.locales = locales  # Locales to fetch text for besides English
+        self.localized_strings_path = localized_strings_path
+        self.manifest_json_path = manifest_json_path
+        self.profile_json_path = profile_json_path
+        self.report_json_path = report_json_path  # None skips the report
+        self.profiler = profiler or Profiler(self.fetcher, enabled=False)
+        self.parse_pool = parse_pool or ParsePool(max_workers=1)  # CPU-bound batches run here
+        # None disables checkpointing
+        self.checkpoint = (
+            QuestCheckpoint(checkpoint_path, self.enrichment_options) if checkpoint_path else None
+        )
+
+        self.expansion_mapping = {}  # Index -> Expansion Name
+        self.instance_content_mapping = {}  # InstanceContent # -> ContentFinderCondition ID
+        self.row_hashes = {}
+        self.reusable_quests = {}
+        self.incomplete_quests = set()  # Quests with a failed fetch, enriched again by the next run
+        self.journal_folder_index = {}
+        self.unlock_instance_ids = []
+        # Quest number -> ContentFinderCondition ID of each of its unlocks, None if unknown.
+        # Locales match their unlock names by ID, the English fields may be changed by assets
+        self.unlock_ids = {}
+        self.graph = None  # Built by link() over the enriched quests
+        self.locale_texts = {}  # Locale -> LocaleText, filled by localize()
+        self.image_assets = None  # Thumbnails made by assets(), written by emit()
+        # Every distinct instance and quest name is resolved once, quests then read them from the memos
+        self.instance_content_memo = Memo("Instance content", self.fetcher)
+        self.image_path_memo = Memo("Quest images", self.fetcher)
+
+    @property
+    def enrichment_options(self):
+        return {
+            "images": self.fetch_images,
+            "journal": self.fetch_journal_entries,
+            "unlocks": self.fetch_unlocks,
+        }
+
+    def run(self):
+        quest_chunks = self.load()
+        quest_rows = self.filter(quest_chunks)
+        quests_by_number = self.enrich(quest_rows)
+        quests_by_number = self.link(quests_by_number)
+        quests_by_expansion = self.order(quests_by_number)
+        if self.assets_dir:
+            self.assets(quests_by_expansion)
+        if self.locales:
+            self.localize(quests_by_expansion)
+        self.validate(quests_by_expansion)
+        quests_array = self.emit(quests_by_expansion)
+        if self.checkpoint is not None:
+            self.checkpoint.discard()
+
+        self.profiler.write(
+            self.profile_json_path,
+            extra={
+                "quests": len(quests_by_number),
+                "emitted_quests": sum(
+                    len(group_quests)
+                    for expansion in quests_array
+                    for group_quests in expansion["quests"].values()
+                ),
+                "memos": {
+                    self.instance_content_memo.name: self.instance_content_memo.stats(),
+                    self.image_path_memo.name: self.image_path_memo.stats(),
+                },
+            },
+        )
+        return quests_array
+
+    """
+        Stages
+    """
+
+    def load(self):
+        # Downloads the mappings and opens Quest.csv, returns its chunks as they are parsed
+        self.profiler.stage("load")
+        self.expansion_mapping = self.load_mapping("ExVersion.csv", "#", "Name")
+        self.instance_content_mapping = self.load_mapping(
+            "InstanceContent.csv", "#", "ContentFinderCondition"
+        )
+
+        response = self.sources.open_csv("Quest.csv")
+        if response is None:
+            raise RuntimeError("Failed to download Quest.csv.")
+        return self.read_quest_csv(response)
+
+    def filter(self, quest_chunks):
+        # Keeps the MSQ rows and extracts them column by column, including the hash of the
+        # columns each quest is built from so the next incremental run can spot changes
+        from quest_frames import pd_filter_msq_quest_data, pd_get_quest_rows
+
+        self.profiler.stage("filter")
+        quest_data = pd_filter_msq_quest_data(quest_chunks)
+        quest_rows = pd_get_quest_rows(quest_data, self.instance_content_mapping)
+        self.row_hashes = {quest_row["#"]: quest_row["Hash"] for quest_row in quest_rows}
+        self.unlock_instance_ids = sorted(
+            {
+                instance_id
+                for quest_row in quest_rows
+                for instance_id in quest_row["UnlockInstanceIds"]
+            }
+        )
+        return quest_rows
+
+    def enrich(self, quest_rows):
+        # Builds quests by number
+        # Structure:
+        # {
+        #   66209: {quest},
+        #   ...
+        # }
+        from tqdm import tqdm
+
+        self.profiler.stage("enrich")
+        self.reusable_quests = (
+            get_reusable_quests(
+                self.manifest_json_path,
+                self.output_json_path,
+                self.row_hashes,
+                self.enrichment_options,
+            )
+            if self.incremental
+            else {}
+        )
+        if self.incremental:
+            logging.info(
+                f"Reusing {len(self.reusable_quests)} unchanged quests, enriching {len(quest_rows) - len(self.reusable_quests)}."
+            )
+
+        # Quests enriched by an unfinished run are reused like unchanged ones, the checkpoint
+        # is then started over with them so it stays complete if this run dies too
+        if self.checkpoint is not None:
+            checkpointed_quests = self.checkpoint.load(self.row_hashes) if self.resume else {}
+            self.checkpoint.open(checkpointed_quests)
+            self.reusable_quests.update(checkpointed_quests)
+        quest_rows_to_enrich = [
+            quest_row for quest_row in quest_rows if quest_row["#"] not in self.reusable_quests
+        ]
+
+        # Quest Id -> journal folder, so every journal lookup is a single request
+        self.journal_folder_index = (
+            self.sources.build_journal_folder_index(
+                quest_row["Id"] for quest_row in quest_rows_to_enrich
+            )
+            if self.fetch_journal_entries
+            else {}
+        )
+
+        # Instances are fetched up front in batches, quest images on first use so they overlap
+        # with the journal fetches of other workers
+        if self.fetch_unlocks:
+            instance_ids = sorted(
+                {
+                    instance_id
+                    for quest_row in quest_rows_to_enrich
+                    for instance_id in quest_row["UnlockInstanceIds"]
+                }
+            )
+            self.instance_content_memo.prime(self.sources.fetch_instance_contents(instance_ids))
+
+        # Enrich quests concurrently, results come back in row order
+        quests_by_number = {}
+        try:
+            with tqdm(total=len(quest_rows), desc="Processing Quests", ncols=100) as pbar:
+                for quest in self.fetcher.map(self.build_quest, quest_rows):
+                    quests_by_number[quest["#"]] = quest
+                    # Quests with failed fetches are left out, so a resumed run fetches them again
+                    if (
+                        self.checkpoint is not None
+                        and quest["#"] not in self.reusable_quests
+                        and quest["#"] not in self.incomplete_quests
+                    ):
+                        self.checkpoint.record(quest, self.row_hashes.get(quest["#"]))
+                    pbar.update(1)
+        finally:
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+        self.instance_content_memo.report()
+        self.image_path_memo.report()
+        if self.incomplete_quests:
+            logging.warning(
+                f"{len(self.incomplete_quests)} quests are missing data that failed to download, the next run fetches them again."
+            )
+        return quests_by_number
+
+    def link(self, quests_by_number):
+        self.profiler.stage("link")
+        self.graph = QuestGraph(quests_by_number)
+        log_cycles(self.graph)
+        assign_quest_groups(quests_by_number, self.graph)
+        link_next_msq(self.graph)
+        return filter_quests_without_next_msq(quests_by_number)
+
+    def order(self, quests_by_number):
+        # Organize the data into the desired structure with correct MSQ order
+        self.profiler.stage("order")
+        if self.graph is None:
+            self.graph = QuestGraph(quests_by_number)
+        quests_by_expansion = group_quests_by_expansion(quests_by_number)
+        first_expansion = self.expansion_mapping[0]
+
+        # Filter out unvisited nodes in the ARR main quest line, starting at 66209
+        main_quest_line = quests_by_expansion[first_expansion][QUEST_GROUP_MAIN_QUEST_LINE]
+        visited_quests = filter_unvisited_quests(
+            main_quest_line, self.graph, CONVERGING_QUEST_ID
+        )
+        quests_by_expansion[first_expansion][QUEST_GROUP_MAIN_QUEST_LINE] = visited_quests
+        logging.info(
+            f"After filtering unvisited nodes, {len(visited_quests)}/{len(main_quest_line)} quests remain in the ARR main quest line."
+        )
+
+        # Sort the A Realm Reborn quests by group
+        quests_by_expansion[first_expansion] = order_quest_groups(
+            quests_by_expansion[first_expansion], quests_by_number, self.graph
+        )
+        return quests_by_expansion
+
+    def validate(self, quests_by_expansion):
+        # Checks the quests about to be emitted and compares them with the last Quests.json
+        self.profiler.stage("validate")
+        report, index = validate_quest_build(quests_by_expansion, self.expansion_mapping[0])
+        previous_quests_by_expansion = load_previous_build(self.output_json_path)
+        if previous_quests_by_expansion is not None:
+            compare_with_previous_build(
+                report, previous_quests_by_expansion, quests_by_expansion, index
+            )
+
+        report.log()
+        if self.report_json_path:
+            report.write(self.report_json_path, len(index))
+        if self.strict and report.errors:
+            raise RuntimeError(
+                f"Validation failed with {len(report.errors)} errors, nothing was written. See {self.report_json_path}."
+            )
+        return report
+
+    def assets(self, quests_by_expansion):
+        # Downloads every distinct image once and points the image fields at local thumbnails,
+        # which are only written by emit() so validation can still stop the run
+        self.profiler.stage("assets")
+        self.image_assets = bundle_image_assets(
+            quests_by_expansion, self.sources, self.parse_pool
+        )
+        return self.image_assets
+
+    def localize(self, quests_by_expansion):
+        # Fetches the text of every extra locale, everything else is shared with English
+        self.profiler.stage("localize")
+        quests = [
+            quest
+            for groups in quests_by_expansion.values()
+            for group_quests in groups.values()
+            for quest in group_quests
+        ]
+
+        journal_folder_index = (
+            self.sources.build_journal_folder_index(quest["Id"] for quest in quests)
+            if self.fetch_journal_entries
+            else None
+        )
+        self.locale_texts = fetch_locale_texts(
+            self.sources,
+            self.locales,
+            quests,
+            self.expansion_mapping,
+            self.unlock_instance_ids if self.fetch_unlocks else [],
+            journal_folder_index,
+        )
+        return self.locale_texts
+
+    def emit(self, quests_by_expansion):
+        self.profiler.stage("emit")
+        # Convert the dictionary into the desired array format
+        quests_array = []
+        for expansion, groups in quests_by_expansion.items():
+            # Convert #, NextMSQ, and PreviousQuests to numbers
+            for group_quests in groups.values():
+                for quest in group_quests:
+                    convert_quest_fields_to_numbers(quest)
+            quests_array.append({"name": expansion, "quests": groups})
+
+        # Thumbnails first, so no written file points at one that does not exist yet
+        if self.image_assets is not None:
+            self.image_assets.write(self.assets_dir)
+        # Save the structured data to a JSON file, replaced only once it is complete
+        write_quests_json(quests_array, self.output_json_path)
+        if self.compact_json_path and self.locale_texts:
+            write_localized_compact_quests(
+                quests_array,
+                self.locale_texts,
+                self.unlock_ids,
+                self.compact_json_path,
+                self.localized_strings_path,
+            )
+        elif self.compact_json_path:
+            write_compact_quests(quests_array, self.compact_json_path)
+        if self.search_index_json_path:
+            write_search_index(quests_array, self.search_index_json_path)
+        if self.positions_json_path:
+            write_quest_positions(quests_array, self.positions_json_path)
+        if self.shards_dir:
+            write_quest_shards(quests_array, self.shards_dir, self.split_details)
+        # Quests with failed fetches are left out, so the next incremental run does not reuse their gaps
+        complete_row_hashes = {
+            quest_number: row_hash
+            for quest_number, row_hash in self.row_hashes.items()
+            if quest_number not in self.incomplete_quests
+        }
+        write_manifest(self.manifest_json_path, complete_row_hashes, self.enrichment_options)
+        if self.image_assets is not None:
+            self.image_assets.prune(self.assets_dir)
+        return quests_array
+
+    """
+        Helpers
+    """
+
+    def load_mapping(self, file_name, key_column, value_column):
+        from quest_frames import pd_read_mapping
+
+        csv_content = self.sources.fetch_csv(file_name)
+        if csv_content is None:
+            raise RuntimeError(f"Failed to download {file_name}.")
+        return pd_read_mapping(csv_content, key_column, value_column)
+
+    def read_quest_csv(self, response):
+        # Parses the streamed Quest.csv only while the filter stage consumes it
+        from quest_frames import pd_read_quest_csv_chunks
+
+        with response:
+            yield from pd_read_quest_csv_chunks(response.raw)
+
+    def resolve_unlocks(self, instance_ids):
+        # Returns the unlocks and the ID each one was resolved from
+        unlocks = []
+        unlock_ids = []
+        for final_id in instance_ids:
+            instance_details = self.instance_content_memo.get(
+                final_id, self.sources.fetch_instance_content
+            )
+            if instance_details:
+                logging.debug(
+                    f"Resolved instance ID {final_id} to {instance_details['Name']}"
+                )
+                unlocks.append(instance_details)
+                unlock_ids.append(final_id)
+            else:
+                logging.warning(f"Failed to fetch instance details for ID {final_id}.")
+        return unlocks, unlock_ids
+
+    def build_quest(self, row):
+        quest_name = row["Name"]
+        quest_id = row["Id"]
+        quest_number = row["#"]
+        quest_icon_type = row["EventIconType"]
+        quest_group = None
+        expansion_name = get_expansion_name(row["Expansion"], self.expansion_mapping)
+
+        # Initialize the Unlocks array
+        unlocks = []
+        unlock_ids = []
+        image_path = None
+        journal_entry = None
+
+        previous_quest = self.reusable_quests.get(quest_number)
+        if previous_quest is not None:
+            # Unchanged since the last build, reuse what was fetched back then
+            unlocks = previous_quest["Unlocks"]
+            # They were resolved from the same row, in order, unless an instance had gone missing
+            unlock_ids = (
+                row["UnlockInstanceIds"]
+                if len(unlocks) == len(row["UnlockInstanceIds"])
+                else None
+            )
+            image_path = previous_quest["Image"]
+            journal_entry = previous_quest["Description"]
+        else:
+            failures = self.fetcher.thread_failures()
+            if self.fetch_unlocks:
+                # Search for instance dungeons unlocked by this quest
+                with self.fetcher.kind("unlocks"):
+                    unlocks, unlock_ids = self.resolve_unlocks(row["UnlockInstanceIds"])
+
+            # Optionally fetch the Image path
+            if self.fetch_images:
+                with self.fetcher.kind("images"):
+                    image_path = (
+                        self.image_path_memo.get(quest_name, self.sources.fetch_image_path)
+                        or None
+                    )
+
+            if self.fetch_journal_entries:
+                with self.fetcher.kind("journal"):
+                    journal_entry = (
+                        self.sources.fetch_first_journal_entry(
+                            quest_id, self.journal_folder_index.get(quest_id)
+                        )
+                        or None
+                    )
+
+            # A failed request leaves a gap that must not be mistaken for missing data, memos
+            # remember the failures of lookups another worker resolved
+            if (
+                self.fetcher.thread_failures() > failures
+                or self.image_path_memo.failed(quest_name)
+                or any(
+                    self.instance_content_memo.failed(instance_id)
+                    for instance_id in row["UnlockInstanceIds"]
+                )
+            ):
+                self.incomplete_quests.add(quest_number)
+        self.unlock_ids[quest_number] = unlock_ids
+
+        # Create the quest entry
+        return {
+            "#": quest_number,
+            "Id": quest_id,
+            "Name": quest_name,
+            "Description": journal_entry,
+            "ExpansionName": expansion_name,
+            "EventIconType": quest_icon_type,
+            "PreviousQuests": row["PreviousQuests"],
+            "NextMSQ": None,  # Initialize as None, to be filled later
+            "QuestGroup": quest_group,
+            "Image": image_path,
+            "Unlocks": unlocks,  # Add the Unlocks property
+        }
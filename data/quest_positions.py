@@ -0,0 +1,58 @@
+import logging
+
+from quest_artifact import dump_compact, write_precompressed
+
+"""
+    Position tables
+
+    Where every quest sits in the ordered output, so the app finds a quest's expansion,
+    group and overall index with one lookup instead of walking every expansion and group:
+
+    {
+      "version": 1,
+      "total": 1234,
+      "order": [quest number, ...],
+      "positions": {"#": [expansion, group, ordinal, index], ...},
+      "expansions": [[first index, count, [[first index, count], ...]], ...]
+    }
+
+    Expansions and groups are referred to by their position in Quests.json, not by name, so
+    the tables also fit localized quests. "order" lists the quest numbers in Quests.json
+    order, "index" is a quest's position in it. The first index of an expansion or group is
+    the number of quests before it. src/lib/questPositions.ts builds the same tables when
+    the file is missing or does not match the loaded quests.
+"""
+
+QUEST_POSITIONS_VERSION = 1
+
+def build_quest_positions(quests_array):
+    order = []
+    positions = {}
+    expansions = []
+    for expansion_index, expansion in enumerate(quests_array):
+        expansion_first = len(order)
+        groups = []
+        for group_index, group_quests in enumerate(expansion["quests"].values()):
+            groups.append([len(order), len(group_quests)])
+            for ordinal, quest in enumerate(group_quests):
+                # A duplicate keeps its first position, validation reports it
+                positions.setdefault(str(quest["#"]), [expansion_index, group_index, ordinal, len(order)])
+                order.append(quest["#"])
+        expansions.append([expansion_first, len(order) - expansion_first, groups])
+
+    return {
+        "version": QUEST_POSITIONS_VERSION,
+        "total": len(order),
+        "order": order,
+        "positions": positions,
+        "expansions": expansions,
+    }
+
+def write_quest_positions(quests_array, path):
+    positions = build_quest_positions(quests_array)
+    sizes = write_precompressed(path, dump_compact(positions))
+    logging.info(
+        f"Positions of {positions['total']} quests written to {path}: "
+        + ", ".join(f"{extension} {size / 1024:.1f} KB" for extension, size in sizes.items())
+    )
+    return positions
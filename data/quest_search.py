@@ -0,0 +1,72 @@
+import re
+import unicodedata
+
+import logging
+
+from quest_artifact import dump_compact, write_precompressed
+
+"""
+    Search index
+
+    An inverted index over quest names, descriptions and unlock names, so the app looks words
+    up instead of scanning every quest on each keystroke:
+
+    {"version": 1, "postings": {"prefix": [first quest number, delta, delta, ...], ...}}
+
+    Text is normalized (FFXIV mark-up removed, accents stripped, lower case) and split into
+    letter/digit tokens. Every prefix of every token is a key, so "bann" finds "Bannock".
+    Postings are sorted quest numbers, stored as the first number followed by the differences.
+    src/lib/searchIndex.ts tokenizes queries the same way.
+"""
+
+SEARCH_INDEX_VERSION = 1
+MARKUP_PATTERN = re.compile(r"<[^>]*>")
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+def normalize_search_text(text):
+    text = MARKUP_PATTERN.sub("", text or "")
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in text if not unicodedata.combining(char)).lower()
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(normalize_search_text(text))
+
+def get_quest_search_tokens(quest):
+    tokens = set(tokenize(quest["Name"]))
+    tokens.update(tokenize(quest["Description"]))
+    for unlock in quest["Unlocks"]:
+        tokens.update(tokenize(unlock["Name"]))
+    return tokens
+
+def delta_encode(numbers):
+    return [numbers[0]] + [current - previous for previous, current in zip(numbers, numbers[1:])]
+
+def build_search_index(quests_array):
+    postings = {}
+    for expansion in quests_array:
+        for group_quests in expansion["quests"].values():
+            for quest in group_quests:
+                prefixes = {
+                    token[:length]
+                    for token in get_quest_search_tokens(quest)
+                    for length in range(1, len(token) + 1)
+                }
+                for prefix in prefixes:
+                    postings.setdefault(prefix, set()).add(quest["#"])
+
+    return {
+        "version": SEARCH_INDEX_VERSION,
+        "postings": {
+            prefix: delta_encode(sorted(quest_numbers))
+            for prefix, quest_numbers in sorted(postings.items())
+        },
+    }
+
+def write_search_index(quests_array, path):
+    index = build_search_index(quests_array)
+    sizes = write_precompressed(path, dump_compact(index))
+    logging.info(
+        f"Search index of {len(index['postings'])} prefixes written to {path}: "
+        + ", ".join(f"{extension} {size / 1024:.1f} KB" for extension, size in sizes.items())
+    )
+    return index
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import re
+
+import logging
+
+from quest_artifact import (
+    QUEST_FIELDS,
+    build_compact_quests,
+    dump_compact,
+    write_precompressed,
+)
+
+"""
+    Shards
+
+    One compact artifact per expansion (see quest_artifact.py) plus a small index, so the app
+    can render one expansion before it has downloaded the others:
+
+    quests/index.json
+      {"version": 1, "expansions": [{"name", "shard", "details", "groups": [
+          {"name", "count", "quests": [[#, Name], ...]}, ...]}, ...]}
+    quests/<expansion>.<hash>.json           every quest column, or all but the details
+    quests/<expansion>-details.<hash>.json   "#", Description and Unlocks, with split_details
+
+    Shard names carry a hash of their content so they can be cached forever, only index.json
+    keeps its name. Shards that are no longer listed in the index are removed.
+"""
+
+SHARDS_INDEX_VERSION = 1
+SHARDS_INDEX_FILE_NAME = "index.json"
+DETAIL_FIELDS = ("Description", "Unlocks")
+CONTENT_HASH_LENGTH = 10
+SHARD_FILE_NAME_PATTERN = re.compile(r"^[a-z0-9-]+\.[0-9a-f]{10}\.json(\.gz|\.br)?$")
+
+def get_slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+def get_hashed_file_name(stem, data):
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:CONTENT_HASH_LENGTH]}.json"
+
+def build_quest_shards(quests_array, split_details=False):
+    # Returns the index and the shards as file name -> contents
+    shard_fields = [
+        field for field in QUEST_FIELDS if not (split_details and field in DETAIL_FIELDS)
+    ]
+    shards = {}
+    expansions = []
+    for expansion in quests_array:
+        slug = get_slug(expansion["name"])
+        data = dump_compact(build_compact_quests([expansion], shard_fields))
+        shard_name = get_hashed_file_name(slug, data)
+        shards[shard_name] = data
+
+        details_name = None
+        if split_details:
+            details = dump_compact(build_compact_quests([expansion], ("#",) + DETAIL_FIELDS))
+            details_name = get_hashed_file_name(f"{slug}-details", details)
+            shards[details_name] = details
+
+        expansions.append(
+            {
+                "name": expansion["name"],
+                "shard": shard_name,
+                "details": details_name,
+                "groups": [
+                    {
+                        "name": group,
+                        "count": len(group_quests),
+                        "quests": [[quest["#"], quest["Name"]] for quest in group_quests],
+                    }
+                    for group, group_quests in expansion["quests"].items()
+                ],
+            }
+        )
+
+    index = {"version": SHARDS_INDEX_VERSION, "expansions": expansions}
+    return index, shards
+
+def write_quest_shards(quests_array, shards_dir, split_details=False):
+    os.makedirs(shards_dir, exist_ok=True)
+    index, shards = build_quest_shards(quests_array, split_details)
+
+    for file_name, data in shards.items():
+        path = os.path.join(shards_dir, file_name)
+        # The name is a hash of the contents, an existing file is already up to date
+        if not os.path.exists(path):
+            write_precompressed(path, data)
+    write_precompressed(os.path.join(shards_dir, SHARDS_INDEX_FILE_NAME), dump_compact(index))
+
+    stale_files = [
+        file_name
+        for file_name in os.listdir(shards_dir)
+        if SHARD_FILE_NAME_PATTERN.match(file_name)
+        and file_name.split(".json")[0] + ".json" not in shards
+    ]
+    for file_name in stale_files:
+        os.remove(os.path.join(shards_dir, file_name))
+
+    logging.info(
+        f"Wrote {len(shards)} quest shards and their index to {shards_dir}, removed {len(stale_files)} stale files."
+    )
+    return index
@@ -0,0 +1,221 @@
+import csv
+import io
+
+import logging
+
+from datamining import RemoteDatamining, DEFAULT_DATAMINING_URL
+
+"""
+    Constants
+"""
+
+DEFAULT_XIVAPI_URL = "https://beta.xivapi.com/api/1"
+DEFAULT_LOCALE = "en"  # Both sources default to English, other locales are asked for explicitly
+JOURNAL_FOLDER = "csv/en/quest"  # Every locale uses the same journal folders
+XIV_BETA_API_ROWS_BATCH_SIZE = 100  # Row IDs per sheet request when resolving in bulk
+
+def journal_folder_for_quest_id(quest_id):
+    # Journal CSVs live in a folder named after the first three digits of the Id suffix,
+    # e.g. ManFst002_00085 -> quest/000/ManFst002_00085.csv
+    _, _, suffix = str(quest_id).rpartition("_")
+    if len(suffix) != 5 or not suffix.isdigit():
+        return None
+    return suffix[:3]
+
+def parse_instance_content(instance_data):
+    fields = instance_data.get("fields", {})
+    return {
+        "Name": fields.get("Name", "Unknown"),
+        "Image": fields.get("Image", {}).get("path_hr1", ""),
+        "ContentTypeName": fields.get("ContentType", {})
+        .get("fields", {})
+        .get("Name", "Unknown"),
+    }
+
+def read_first_journal_entry(csv_content):
+    # The text of the first row of a journal CSV. Only that row is parsed, the csv module
+    # still handles quoted commas and line breaks in it
+    for row in csv.reader(io.StringIO(csv_content)):
+        if row:
+            return row[2] if len(row) > 2 and row[2] else None
+    return None
+
+class QuestSources:
+    # Everything the pipeline reads: the ffxiv-datamining CSVs and the XIVAPI lookups.
+    # The CSVs come from the given datamining source (see datamining.py), downloaded from
+    # datamining_url without one. All requests go through the given Fetcher, so its pool,
+    # rate limits and cache apply
+    def __init__(
+        self,
+        fetcher,
+        datamining_url=DEFAULT_DATAMINING_URL,
+        xivapi_url=DEFAULT_XIVAPI_URL,
+        locale=DEFAULT_LOCALE,
+        datamining=None,
+    ):
+        self.fetcher = fetcher
+        self.locale = locale
+        self.datamining = datamining or RemoteDatamining(fetcher, datamining_url)
+        self.csv_folder = f"csv/{locale}"
+        self.journal_csv_folder = f"{self.csv_folder}/quest"  # + folder + quest_id + '.csv'
+        self.xivapi_url = xivapi_url.rstrip("/")
+        self.search_url = f"{self.xivapi_url}/search"
+        self.instance_content_url = f"{self.xivapi_url}/sheet/ContentFinderCondition"
+        self.asset_url = f"{self.xivapi_url}/asset"
+        self.xivapi_params = {} if locale == DEFAULT_LOCALE else {"language": locale}
+
+    def for_locale(self, locale):
+        # The same sources in another client language, sharing this one's fetcher
+        return QuestSources(
+            self.fetcher, xivapi_url=self.xivapi_url, locale=locale, datamining=self.datamining
+        )
+
+    def fetch(self, url, params=None, max_retries=5, delay=2, stream=False):
+        return self.fetcher.get(
+            url, params=params, max_retries=max_retries, delay=delay, stream=stream
+        )
+
+    """
+        Datamining CSVs
+    """
+
+    def fetch_csv(self, file_name):
+        # Returns the decoded contents of csv/<locale>/<file_name>, or None
+        return self.datamining.read_text(f"{self.csv_folder}/{file_name}")
+
+    def open_csv(self, file_name):
+        # Returns csv/<locale>/<file_name> as a stream, read it from .raw and close it
+        return self.datamining.open(f"{self.csv_folder}/{file_name}")
+
+    """
+        Journal entries
+    """
+
+    def fetch_journal_folder_listing(self):
+        # One listing of csv/en/quest, only needed for Ids that do not follow the suffix scheme
+        with self.fetcher.kind("journal"):
+            return self.datamining.list_csv_files(JOURNAL_FOLDER)
+
+    def build_journal_folder_index(self, quest_ids):
+        index = {}
+        unresolved_quest_ids = []
+        for quest_id in quest_ids:
+            folder = journal_folder_for_quest_id(quest_id)
+            if folder is None:
+                unresolved_quest_ids.append(quest_id)
+            else:
+                index[quest_id] = folder
+
+        if unresolved_quest_ids:
+            logging.info(
+                f"{len(unresolved_quest_ids)} quest IDs have no folder suffix, resolving them from the folder listing."
+            )
+            listing = self.fetch_journal_folder_listing()
+            for quest_id in unresolved_quest_ids:
+                if quest_id in listing:
+                    index[quest_id] = listing[quest_id]
+
+        return index
+
+    def fetch_first_journal_entry(self, quest_id, folder, max_retries=5, delay=2):
+        if folder is None:
+            logging.warning(f"No journal folder known for quest ID: {quest_id}.")
+            return None
+
+        csv_path = f"{self.journal_csv_folder}/{folder}/{quest_id}.csv"
+        csv_content = self.datamining.read_text(csv_path, max_retries=max_retries, delay=delay)
+        if csv_content is None:
+            logging.warning(f"No journal entry found for quest ID: {quest_id}.")
+            return None
+
+        try:
+            journal_entry = read_first_journal_entry(csv_content)
+            if journal_entry is not None:
+                return journal_entry
+        except csv.Error as e:
+            logging.warning(f"Failed to process CSV {csv_path}: {e}")
+
+        logging.warning(f"No journal entry found for quest ID: {quest_id}.")
+        return None
+
+    """
+        XIVAPI lookups
+    """
+
+    def fetch_instance_content(self, instance_id):
+        response = self.fetch(
+            f"{self.instance_content_url}/{instance_id}", params=self.xivapi_params or None
+        )
+        if response is None:
+            logging.warning(f"Failed to fetch instance content for ID {instance_id}.")
+            return None
+
+        try:
+            return parse_instance_content(response.json())
+        except Exception as e:
+            logging.warning(f"Failed to parse instance content for ID {instance_id}: {e}")
+        return None
+
+    def fetch_instance_content_batch(self, instance_ids):
+        # One sheet request for many rows, IDs missing from the answer are left to fetch_instance_content
+        with self.fetcher.kind("unlocks"):
+            response = self.fetch(
+                self.instance_content_url,
+                params={
+                    "rows": ",".join(str(instance_id) for instance_id in instance_ids),
+                    "limit": len(instance_ids),
+                    **self.xivapi_params,
+                },
+            )
+        if response is None:
+            logging.warning(f"Failed to fetch instance content batch of {len(instance_ids)} IDs.")
+            return {}
+
+        try:
+            return {
+                row["row_id"]: parse_instance_content(row)
+                for row in response.json().get("rows", [])
+            }
+        except Exception as e:
+            logging.warning(f"Failed to parse instance content batch: {e}")
+        return {}
+
+    def fetch_instance_contents(self, instance_ids):
+        batches = [
+            instance_ids[i : i + XIV_BETA_API_ROWS_BATCH_SIZE]
+            for i in range(0, len(instance_ids), XIV_BETA_API_ROWS_BATCH_SIZE)
+        ]
+        instance_contents = {}
+        for batch_contents in self.fetcher.map(self.fetch_instance_content_batch, batches):
+            instance_contents.update(batch_contents)
+        return instance_contents
+
+    def fetch_image_path(self, quest_name):
+        response = self.fetch(
+            self.search_url,
+            params={
+                "sheets": "Quest",
+                "query": f'Name~"{quest_name}"',
+                "fields": "Icon,Name",
+                **self.xivapi_params,
+            },
+        )
+        if response is None:
+            logging.warning(f"Failed to fetch image for quest '{quest_name}'.")
+            return None
+
+        try:
+            data = response.json()
+            if data.get("results"):
+                return data["results"][0]["fields"]["Icon"]["path_hr1"]
+        except Exception as e:
+            logging.warning(f"Failed to parse image data for quest '{quest_name}': {e}")
+        return None
+
+    def fetch_asset(self, image_path):
+        # Returns the texture at an XIVAPI path converted to PNG, or None
+        response = self.fetch(self.asset_url, params={"path": image_path, "format": "png"})
+        if response is None:
+            logging.warning(f"Failed to fetch image {image_path}.")
+            return None
+        return response.content
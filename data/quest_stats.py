@@ -0,0 +1,60 @@
+import os
+
+"""
+    Build statistics
+
+    Counts of an existing Quests.json and the sizes of the files written next to it, for
+    the stats command of prepare_quest_data.py. Nothing here touches the network.
+"""
+
+STAT_FIELDS = ("groups", "quests", "descriptions", "images", "unlocks")
+OUTPUT_FILE_PREFIX = "Quests."
+OUTPUT_DIRS = ("quests", "assets")  # Shards and image thumbnails, summed per folder
+
+def get_expansion_stats(name, groups):
+    quests = [quest for group_quests in groups.values() for quest in group_quests]
+    return {
+        "name": name,
+        "groups": len(groups),
+        "quests": len(quests),
+        "descriptions": sum(1 for quest in quests if quest["Description"]),
+        "images": sum(1 for quest in quests if quest["Image"]),
+        "unlocks": sum(len(quest["Unlocks"]) for quest in quests),
+    }
+
+def get_output_sizes(static_dir):
+    # File or folder name -> bytes, for every output found in static_dir
+    if not os.path.isdir(static_dir):
+        return {}
+    sizes = {}
+    for file_name in sorted(os.listdir(static_dir)):
+        path = os.path.join(static_dir, file_name)
+        if file_name.startswith(OUTPUT_FILE_PREFIX) and os.path.isfile(path):
+            sizes[file_name] = os.path.getsize(path)
+    for dir_name in OUTPUT_DIRS:
+        dir_path = os.path.join(static_dir, dir_name)
+        if os.path.isdir(dir_path):
+            sizes[f"{dir_name}/"] = sum(
+                os.path.getsize(os.path.join(dir_path, file_name))
+                for file_name in os.listdir(dir_path)
+            )
+    return sizes
+
+def get_build_stats(quests_by_expansion, static_dir):
+    expansions = [
+        get_expansion_stats(name, groups) for name, groups in quests_by_expansion.items()
+    ]
+    return {
+        "expansions": expansions,
+        "totals": {field: sum(expansion[field] for expansion in expansions) for field in STAT_FIELDS},
+        "files": get_output_sizes(static_dir),
+    }
+
+def format_build_stats(stats):
+    lines = [f"{'expansion':<24}" + "".join(f"{field:>14}" for field in STAT_FIELDS)]
+    for row in [*stats["expansions"], {"name": "total", **stats["totals"]}]:
+        lines.append(f"{row['name']:<24}" + "".join(f"{row[field]:>14}" for field in STAT_FIELDS))
+    if stats["files"]:
+        lines.append("")
+        lines += [f"{name:<38}{size / 1024:>12.1f} KB" for name, size in stats["files"].items()]
+    return "\n".join(lines)
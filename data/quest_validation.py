@@ -0,0 +1,331 @@
+import json
+import os
+
+import logging
+
+from datetime import datetime, timezone
+from quest_linking import QUEST_GROUP_MAIN_QUEST_LINE, QUEST_GROUPS, STARTING_QUEST_IDS
+
+"""
+    Validation
+
+    Checks the ordered quests in one pass over an index of where every quest ended up, and
+    compares them with the previous build. Errors mean the output is broken and should not
+    be published, warnings are kept for a look in the report:
+
+    error    duplicate_number    a quest number appears more than once
+    error    duplicate_id        a quest Id appears more than once
+    error    missing_group       an expansion lacks a required group, or a group is empty
+    error    misplaced_quest     a quest sits in another expansion or group than its own
+    error    next_msq_cycle      following NextMSQ comes back to a quest already passed
+    error    missing_start       a starting quest is not in the output
+    error    mass_removal        more than MAX_REMOVED_FRACTION of the previous quests are gone
+    warning  dangling_next_msq   NextMSQ points to a quest that is not in the output
+    warning  chain_break         a quest of a chained group is not followed by its NextMSQ
+    warning  orphan_quest        nothing leads to a quest that is not a starting quest
+
+    The report is written as JSON:
+
+    {"version": 1, "errors": 0, "warnings": 2, "counts": {check: count},
+     "issues": [{"check", "severity", "quest", "message"}, ...],
+     "diff": {"added", "removed", "moved", "reordered", "changed"}}
+"""
+
+REPORT_VERSION = 1
+MAX_REMOVED_FRACTION = 0.1
+SEVERITY_ERROR = "error"
+SEVERITY_WARNING = "warning"
+
+class ValidationReport:
+    def __init__(self):
+        self.issues = []
+        self.diff = None
+
+    def add(self, check, severity, message, quest_number=None):
+        self.issues.append(
+            {"check": check, "severity": severity, "quest": quest_number, "message": message}
+        )
+
+    def count(self, severity):
+        return sum(1 for issue in self.issues if issue["severity"] == severity)
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue["severity"] == SEVERITY_ERROR]
+
+    def counts(self):
+        counts = {}
+        for issue in self.issues:
+            counts[issue["check"]] = counts.get(issue["check"], 0) + 1
+        return counts
+
+    def to_dict(self, quest_count):
+        return {
+            "version": REPORT_VERSION,
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "quests": quest_count,
+            "errors": self.count(SEVERITY_ERROR),
+            "warnings": self.count(SEVERITY_WARNING),
+            "counts": self.counts(),
+            "issues": self.issues,
+            "diff": self.diff,
+        }
+
+    def log(self):
+        for issue in self.errors:
+            logging.warning(f"❌ {issue['check']}: {issue['message']}")
+        warning_counts = {
+            check: count
+            for check, count in self.counts().items()
+            if any(
+                issue["check"] == check and issue["severity"] == SEVERITY_WARNING
+                for issue in self.issues
+            )
+        }
+        logging.info(
+            f"Validation found {self.count(SEVERITY_ERROR)} errors and {self.count(SEVERITY_WARNING)} warnings"
+            + (f" ({', '.join(f'{check}: {count}' for check, count in warning_counts.items())})." if warning_counts else ".")
+        )
+        if self.diff is not None:
+            logging.info(
+                f"Compared with the previous build: {len(self.diff['added'])} added, {len(self.diff['removed'])} removed, "
+                f"{len(self.diff['moved'])} moved, {len(self.diff['reordered'])} reordered, {len(self.diff['changed'])} changed."
+            )
+
+    def write(self, path, quest_count):
+        with open(path, "w") as report_file:
+            json.dump(self.to_dict(quest_count), report_file, indent=1, ensure_ascii=False)
+
+"""
+    Checks
+"""
+
+def index_quests(quests_by_expansion, report):
+    # Quest number -> (expansion, group, position, quest), the one pass every check reads from
+    index = {}
+    quest_ids = {}
+    for expansion, groups in quests_by_expansion.items():
+        for group, group_quests in groups.items():
+            for position, quest in enumerate(group_quests):
+                quest_number = quest["#"]
+                if quest_number in index:
+                    report.add(
+                        "duplicate_number",
+                        SEVERITY_ERROR,
+                        f"Quest {quest_number} appears in {index[quest_number][0]} / {index[quest_number][1]} and {expansion} / {group}.",
+                        quest_number,
+                    )
+                else:
+                    index[quest_number] = (expansion, group, position, quest)
+                if quest["Id"] in quest_ids:
+                    report.add(
+                        "duplicate_id",
+                        SEVERITY_ERROR,
+                        f"Quests {quest_ids[quest['Id']]} and {quest_number} share the Id {quest['Id']}.",
+                        quest_number,
+                    )
+                else:
+                    quest_ids[quest["Id"]] = quest_number
+    return index
+
+def check_groups(quests_by_expansion, required_groups, report):
+    # required_groups maps an expansion to the groups it must have, "*" applies to all
+    for expansion, groups in quests_by_expansion.items():
+        for group in required_groups.get(expansion, required_groups.get("*", [])):
+            if group not in groups:
+                report.add("missing_group", SEVERITY_ERROR, f"{expansion} has no {group} group.")
+        for group, group_quests in groups.items():
+            if not group_quests:
+                report.add("missing_group", SEVERITY_ERROR, f"{expansion} / {group} is empty.")
+
+def check_placement(index, report):
+    for quest_number, (expansion, group, _, quest) in index.items():
+        if quest["ExpansionName"] != expansion:
+            report.add(
+                "misplaced_quest",
+                SEVERITY_ERROR,
+                f"'{quest['Name']}' ({quest_number}) of {quest['ExpansionName']} is listed under {expansion}.",
+                quest_number,
+            )
+        if quest["QuestGroup"] is not None and quest["QuestGroup"] != group:
+            report.add(
+                "misplaced_quest",
+                SEVERITY_ERROR,
+                f"'{quest['Name']}' ({quest_number}) of group {quest['QuestGroup']} is listed under {group}.",
+                quest_number,
+            )
+
+def check_next_msq(index, report):
+    # Every quest has at most one NextMSQ, so each walk stops at the first quest already seen
+    finished = set()
+    for start in index:
+        path = []
+        on_path = set()
+        quest_number = start
+        while quest_number is not None and quest_number not in finished:
+            if quest_number in on_path:
+                cycle = path[path.index(quest_number) :]
+                report.add(
+                    "next_msq_cycle",
+                    SEVERITY_ERROR,
+                    f"NextMSQ loops through {' -> '.join(str(number) for number in cycle)} -> {quest_number}.",
+                    quest_number,
+                )
+                break
+            if quest_number not in index:
+                previous_quest = index[path[-1]][3]
+                report.add(
+                    "dangling_next_msq",
+                    SEVERITY_WARNING,
+                    f"'{previous_quest['Name']}' ({previous_quest['#']}) points to {quest_number}, which is not in the output.",
+                    previous_quest["#"],
+                )
+                break
+            path.append(quest_number)
+            on_path.add(quest_number)
+            quest_number = index[quest_number][3]["NextMSQ"]
+        finished.update(path)
+
+def check_chains(quests_by_expansion, chained_expansions, report):
+    # Groups of these expansions are ordered by NextMSQ, each quest should link to the next
+    for expansion in chained_expansions:
+        for group, group_quests in quests_by_expansion.get(expansion, {}).items():
+            for current_quest, next_quest in zip(group_quests, group_quests[1:]):
+                if current_quest["NextMSQ"] != next_quest["#"]:
+                    report.add(
+                        "chain_break",
+                        SEVERITY_WARNING,
+                        f"'{current_quest['Name']}' ({current_quest['#']}) in {expansion} / {group} is followed by {next_quest['#']}, but links to {current_quest['NextMSQ']}.",
+                        current_quest["#"],
+                    )
+
+def check_reachability(index, starting_quest_ids, report):
+    for quest_number in starting_quest_ids:
+        if quest_number not in index:
+            report.add("missing_start", SEVERITY_ERROR, f"Starting quest {quest_number} is missing.", quest_number)
+
+    linked = {entry[3]["NextMSQ"] for entry in index.values()}
+    for quest_number, (_, _, _, quest) in index.items():
+        if quest_number in linked or quest_number in starting_quest_ids:
+            continue
+        if not any(previous_quest in index for previous_quest in quest["PreviousQuests"]):
+            report.add(
+                "orphan_quest",
+                SEVERITY_WARNING,
+                f"Nothing leads to '{quest['Name']}' ({quest_number}).",
+                quest_number,
+            )
+
+def validate_quests(quests_by_expansion, starting_quest_ids, required_groups, chained_expansions):
+    report = ValidationReport()
+    index = index_quests(quests_by_expansion, report)
+    check_groups(quests_by_expansion, required_groups, report)
+    check_placement(index, report)
+    check_next_msq(index, report)
+    check_chains(quests_by_expansion, chained_expansions, report)
+    check_reachability(index, starting_quest_ids, report)
+    return report, index
+
+def validate_quest_build(quests_by_expansion, first_expansion):
+    # The checks of every build, first_expansion is the one with the city-state groups
+    return validate_quests(
+        quests_by_expansion,
+        STARTING_QUEST_IDS,
+        required_groups={
+            first_expansion: QUEST_GROUPS,
+            "*": [QUEST_GROUP_MAIN_QUEST_LINE],
+        },
+        # Only the A Realm Reborn groups are ordered by NextMSQ, see QuestPipeline.order()
+        chained_expansions=[first_expansion],
+    )
+
+"""
+    Diff with the previous build
+"""
+
+def load_quests_json(path):
+    # A Quests.json as expansion -> group -> quests
+    with open(path) as json_file:
+        return {expansion["name"]: expansion["quests"] for expansion in json.load(json_file)}
+
+def load_previous_build(path):
+    # The last Quests.json, None if there is none
+    if not os.path.exists(path):
+        return None
+    try:
+        return load_quests_json(path)
+    except Exception as e:
+        logging.warning(f"Failed to load the previous build from {path}: {e}")
+    return None
+
+def get_predecessors(group_quests, quest_numbers):
+    # Quest number -> the quest before it, counting only the given quests
+    predecessors = {}
+    previous_quest_number = None
+    for quest in group_quests:
+        if quest["#"] in quest_numbers:
+            predecessors[quest["#"]] = previous_quest_number
+            previous_quest_number = quest["#"]
+    return predecessors
+
+def diff_quests(previous_index, index):
+    # Both indexes as built by index_quests()
+    added = sorted(set(index) - set(previous_index))
+    removed = sorted(set(previous_index) - set(index))
+    moved = []
+    changed = []
+    for quest_number in sorted(set(index) & set(previous_index)):
+        previous_expansion, previous_group, _, previous_quest = previous_index[quest_number]
+        expansion, group, _, quest = index[quest_number]
+        if (previous_expansion, previous_group) != (expansion, group):
+            moved.append(
+                {"#": quest_number, "from": [previous_expansion, previous_group], "to": [expansion, group]}
+            )
+        fields = {
+            field: {"before": previous_quest.get(field), "after": value}
+            for field, value in quest.items()
+            if previous_quest.get(field) != value
+        }
+        if fields:
+            changed.append({"#": quest_number, "fields": fields})
+    return {
+        "previous": len(previous_index),
+        "added": added,
+        "removed": removed,
+        "moved": moved,
+        "changed": changed,
+    }
+
+def get_reordered(previous_quests_by_expansion, quests_by_expansion):
+    # Quests of the same group whose predecessor changed, quests added or removed aside
+    reordered = []
+    for expansion, groups in quests_by_expansion.items():
+        for group, group_quests in groups.items():
+            previous_group_quests = previous_quests_by_expansion.get(expansion, {}).get(group, [])
+            quest_numbers = {quest["#"] for quest in group_quests} & {
+                quest["#"] for quest in previous_group_quests
+            }
+            previous_predecessors = get_predecessors(previous_group_quests, quest_numbers)
+            for quest_number, predecessor in get_predecessors(group_quests, quest_numbers).items():
+                if previous_predecessors[quest_number] != predecessor:
+                    reordered.append(quest_number)
+    return reordered
+
+def diff_builds(previous_quests_by_expansion, quests_by_expansion, index=None):
+    # index is the one validate_quests() returned for quests_by_expansion, if at hand
+    if index is None:
+        index = index_quests(quests_by_expansion, ValidationReport())
+    previous_index = index_quests(previous_quests_by_expansion, ValidationReport())
+    diff = diff_quests(previous_index, index)
+    diff["reordered"] = get_reordered(previous_quests_by_expansion, quests_by_expansion)
+    return diff
+
+def compare_with_previous_build(report, previous_quests_by_expansion, quests_by_expansion, index):
+    report.diff = diff_builds(previous_quests_by_expansion, quests_by_expansion, index)
+    previous_count = report.diff["previous"]
+    if previous_count and len(report.diff["removed"]) > MAX_REMOVED_FRACTION * previous_count:
+        report.add(
+            "mass_removal",
+            SEVERITY_ERROR,
+            f"{len(report.diff['removed'])} of the {previous_count} quests of the previous build are gone.",
+        )
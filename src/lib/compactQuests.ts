@@ -0,0 +1,178 @@
+import { base } from "$app/paths";
+import type { ExpansionsQuests, Quest, Quests, Unlock } from "$lib/model";
+
+type CompactGroup = [group: number, firstRow: number, count: number];
+
+/**
+ * Compact quests artifact (static/Quests.compact.json), written by data/quest_artifact.py.
+ * Quests are stored column by column and every string once in a string table,
+ * string fields hold indexes into `strings` and -1 stands for null.
+ */
+export type CompactQuests = {
+  version: number;
+  strings: string[];
+  expansions: [name: number, groups: CompactGroup[]][];
+  quests: {
+    "#": number[];
+    Id: number[];
+    Name: number[];
+    Description?: number[]; // Left out of shards with split details
+    ExpansionName: number[];
+    EventIconType: number[];
+    PreviousQuests: number[][];
+    NextMSQ: (number | null)[];
+    QuestGroup: number[];
+    Image: number[];
+    Unlocks?: number[][]; // Rows of `unlocks`, left out of shards with split details
+  };
+  unlocks: {
+    Name: number[];
+    Image: number[];
+    ContentTypeName: number[];
+  };
+};
+
+/**
+ * String table of one client language (static/Quests.strings.<locale>.json),
+ * written by data/quest_locales.py. It is in the same order as the strings of
+ * Quests.compact.json and replaces them.
+ */
+export type LocalizedStrings = {
+  version: number;
+  locale: string;
+  strings: string[];
+};
+
+export const COMPACT_QUESTS_VERSION = 1;
+export const LOCALIZED_STRINGS_VERSION = 1;
+export const SUPPORTED_LOCALES = ["ja", "de", "fr"];
+
+function getString(strings: string[], ref: number): string | null {
+  return ref === -1 ? null : strings[ref];
+}
+
+function checkVersion(compact: CompactQuests): void {
+  if (compact.version !== COMPACT_QUESTS_VERSION) {
+    throw new Error(`Unsupported compact quests version ${compact.version}`);
+  }
+}
+
+/**
+ * Builds every unlock once, quests share them by row.
+ * @param compact The parsed compact artifact
+ * @returns Unlock[]
+ */
+function expandUnlocks(compact: CompactQuests): Unlock[] {
+  const { strings, unlocks } = compact;
+  return unlocks.Name.map(
+    (name, row) =>
+      ({
+        Name: getString(strings, name),
+        Image: getString(strings, unlocks.Image[row]),
+        ContentTypeName: getString(strings, unlocks.ContentTypeName[row]),
+      }) as Unlock,
+  );
+}
+
+/**
+ * Rebuilds the Quests.json structure from the compact artifact.
+ * @param compact The parsed compact artifact
+ * @returns ExpansionsQuests
+ */
+export function expandCompactQuests(
+  compact: CompactQuests,
+): ExpansionsQuests {
+  checkVersion(compact);
+  const { strings, quests } = compact;
+  const string = (ref: number): string | null => getString(strings, ref);
+  const unlocks = expandUnlocks(compact);
+
+  const expandQuest = (row: number): Quest => ({
+    "#": quests["#"][row],
+    Id: string(quests.Id[row])!,
+    Name: string(quests.Name[row])!,
+    Description: quests.Description ? string(quests.Description[row]) : null,
+    ExpansionName: string(quests.ExpansionName[row])!,
+    EventIconType: quests.EventIconType[row],
+    PreviousQuests: quests.PreviousQuests[row],
+    NextMSQ: quests.NextMSQ[row],
+    QuestGroup: string(quests.QuestGroup[row]),
+    Image: string(quests.Image[row]),
+    Unlocks: quests.Unlocks
+      ? quests.Unlocks[row].map((unlockRow) => unlocks[unlockRow])
+      : [],
+  });
+
+  return compact.expansions.map(([name, groups]) => {
+    const groupedQuests: Quests = {};
+    for (const [group, firstRow, count] of groups) {
+      groupedQuests[string(group)!] = Array.from({ length: count }, (_, i) =>
+        expandQuest(firstRow + i),
+      );
+    }
+    return { name: string(name)!, quests: groupedQuests };
+  });
+}
+
+/**
+ * Lists the expansion names in the language of the artifact's strings.
+ * @param compact The parsed compact artifact
+ * @returns The names, in expansion order
+ */
+export function getExpansionNames(compact: CompactQuests): string[] {
+  return compact.expansions.map(([name]) => compact.strings[name]);
+}
+
+/**
+ * Picks the first of the browser's languages the quests are available in.
+ * @returns The locale, or null for English
+ */
+export function getPreferredLocale(): string | null {
+  if (typeof navigator === "undefined") {
+    return null;
+  }
+  for (const language of navigator.languages ?? [navigator.language]) {
+    const locale = language.slice(0, 2).toLowerCase();
+    if (locale === "en") return null;
+    if (SUPPORTED_LOCALES.includes(locale)) return locale;
+  }
+  return null;
+}
+
+/**
+ * Fetches the string table of a locale.
+ * @param fetch The fetch function to use
+ * @param locale The locale to fetch
+ * @returns LocalizedStrings | null
+ */
+export async function loadLocalizedStrings(
+  fetch: typeof globalThis.fetch,
+  locale: string,
+): Promise<LocalizedStrings | null> {
+  try {
+    const response = await fetch(`${base}/Quests.strings.${locale}.json`);
+    if (!response.ok) {
+      return null;
+    }
+    const localized: LocalizedStrings = await response.json();
+    return localized.version === LOCALIZED_STRINGS_VERSION ? localized : null;
+  } catch {
+    return null;
+  }
+}
+
+/**
+ * Swaps the strings of the compact artifact for those of another locale.
+ * @param compact The parsed compact artifact
+ * @param localized The string table of the locale
+ * @returns The localized artifact, or the given one if the tables don't match
+ */
+export function localizeCompactQuests(
+  compact: CompactQuests,
+  localized: LocalizedStrings,
+): CompactQuests {
+  if (localized.strings.length !== compact.strings.length) {
+    return compact;
+  }
+  return { ...compact, strings: localized.strings };
+}
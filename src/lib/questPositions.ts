@@ -0,0 +1,179 @@
+import { base } from "$app/paths";
+import type { ExpansionsQuests, Quest } from "$lib/model";
+
+/**
+ * Expansion index, group index, ordinal within the group and overall index of
+ * a quest. Expansions and groups are counted in Quests.json order.
+ */
+export type QuestPosition = [number, number, number, number];
+
+/**
+ * Precomputed position tables (static/Quests.positions.json), written by
+ * data/quest_positions.py. Every expansion and group is stored as the overall
+ * index of its first quest and its quest count.
+ */
+export type QuestPositions = {
+  version: number;
+  total: number;
+  order: number[];
+  positions: Record<string, QuestPosition>;
+  expansions: [number, number, [number, number][]][];
+};
+
+/**
+ * Completed quests counted per expansion and group, plus the overall index of
+ * the last completed quest (-1 if there is none).
+ */
+export type CompletedTally = {
+  expansions: number[];
+  groups: number[][];
+  last: number;
+};
+
+export const QUEST_POSITIONS_VERSION = 1;
+
+/**
+ * Builds the position tables from the quests, for when the prebuilt ones are
+ * missing or stale.
+ * @param quests The quests to index
+ * @returns QuestPositions
+ */
+export function buildQuestPositions(quests: ExpansionsQuests): QuestPositions {
+  const order: number[] = [];
+  const positions: Record<string, QuestPosition> = {};
+  const expansions: QuestPositions["expansions"] = [];
+
+  quests.forEach((expansion, expansionIndex) => {
+    const expansionFirst = order.length;
+    const groups: [number, number][] = [];
+    Object.values(expansion.quests).forEach((groupQuests, groupIndex) => {
+      groups.push([order.length, groupQuests.length]);
+      groupQuests.forEach((quest, ordinal) => {
+        // A duplicate keeps its first position, like the prebuilt tables
+        positions[quest["#"]] ??= [
+          expansionIndex,
+          groupIndex,
+          ordinal,
+          order.length,
+        ];
+        order.push(quest["#"]);
+      });
+    });
+    expansions.push([expansionFirst, order.length - expansionFirst, groups]);
+  });
+
+  return {
+    version: QUEST_POSITIONS_VERSION,
+    total: order.length,
+    order,
+    positions,
+    expansions,
+  };
+}
+
+/**
+ * Checks that the tables describe the same expansions and groups as the
+ * quests, with the same quest numbers in the same order.
+ * @param positions The position tables
+ * @param quests The loaded quests
+ * @returns boolean
+ */
+export function matchesQuests(
+  positions: QuestPositions,
+  quests: ExpansionsQuests,
+): boolean {
+  let index = 0;
+  const matches =
+    positions.expansions.length === quests.length &&
+    quests.every((expansion, expansionIndex) => {
+      const groups = Object.values(expansion.quests);
+      const [, , groupRanges] = positions.expansions[expansionIndex];
+      return (
+        groupRanges.length === groups.length &&
+        groups.every(
+          (groupQuests, groupIndex) =>
+            groupRanges[groupIndex][0] === index &&
+            groupRanges[groupIndex][1] === groupQuests.length &&
+            groupQuests.every(
+              (quest) => positions.order[index++] === quest["#"],
+            ),
+        )
+      );
+    });
+  return (
+    matches && index === positions.order.length && index === positions.total
+  );
+}
+
+/**
+ * Looks up the quest at an overall index.
+ * @param quests The loaded quests
+ * @param positions Their position tables
+ * @param index The overall index
+ * @returns Quest | null
+ */
+export function getQuestAt(
+  quests: ExpansionsQuests,
+  positions: QuestPositions,
+  index: number,
+): Quest | null {
+  const position = positions.positions[positions.order[index]];
+  if (!position) {
+    return null;
+  }
+  const [expansionIndex, groupIndex, ordinal] = position;
+  const expansion = quests[expansionIndex];
+  return expansion
+    ? (Object.values(expansion.quests)[groupIndex]?.[ordinal] ?? null)
+    : null;
+}
+
+/**
+ * Counts the completed quests of every expansion and group in one pass over
+ * the completed quests.
+ * @param positions The position tables
+ * @param completed Completion by quest number
+ * @returns CompletedTally
+ */
+export function tallyCompleted(
+  positions: QuestPositions,
+  completed: Record<number, boolean>,
+): CompletedTally {
+  const tally: CompletedTally = {
+    expansions: positions.expansions.map(() => 0),
+    groups: positions.expansions.map(([, , groups]) => groups.map(() => 0)),
+    last: -1,
+  };
+  for (const questNumber in completed) {
+    const position = completed[questNumber]
+      ? positions.positions[questNumber]
+      : undefined;
+    if (!position) continue;
+
+    const [expansionIndex, groupIndex, , index] = position;
+    tally.expansions[expansionIndex]++;
+    tally.groups[expansionIndex][groupIndex]++;
+    tally.last = Math.max(tally.last, index);
+  }
+  return tally;
+}
+
+/**
+ * Fetches the prebuilt position tables, the app builds them itself without.
+ * @param fetch The fetch function to use
+ * @returns QuestPositions | null
+ */
+export async function loadQuestPositions(
+  fetch: typeof globalThis.fetch,
+): Promise<QuestPositions | null> {
+  try {
+    const response = await fetch(`${base}/Quests.positions.json`);
+    if (!response.ok) {
+      return null;
+    }
+    const positions: QuestPositions = await response.json();
+    return positions.version === QUEST_POSITIONS_VERSION ? positions : null;
+  } catch {
+    return null;
+  }
+}
@@ -0,0 +1,90 @@
+import { base } from "$app/paths";
+
+/**
+ * Prebuilt search index (static/Quests.search.json), written by
+ * data/quest_search.py. Every prefix of every normalized token of a quest's
+ * name, description and unlock names maps to the quest numbers containing it,
+ * delta encoded.
+ */
+export type SearchIndex = {
+  version: number;
+  postings: Record<string, number[]>;
+};
+
+export const SEARCH_INDEX_VERSION = 1;
+
+/**
+ * Normalizes text like the index builder: strips FFXIV mark-up and accents and
+ * lower cases it, then splits it into letter/digit tokens.
+ * @param text The text to tokenize
+ * @returns string[]
+ */
+export function tokenize(text: string): string[] {
+  return (
+    text
+      .replace(/<[^>]*>/g, "")
+      .normalize("NFKD")
+      .replace(/\p{M}/gu, "")
+      .toLowerCase()
+      .match(/[\p{L}\p{N}]+/gu) ?? []
+  );
+}
+
+function decodePostings(deltas: number[]): number[] {
+  const questNumbers = new Array<number>(deltas.length);
+  let questNumber = 0;
+  for (let i = 0; i < deltas.length; i++) {
+    questNumber += deltas[i];
+    questNumbers[i] = questNumber;
+  }
+  return questNumbers;
+}
+
+/**
+ * Looks up the quests matching every word of a query, each word matching the
+ * start of a word in the quest's name, description or unlocks.
+ * @param index The search index
+ * @param query The search query
+ * @returns The matching quest numbers, or null for a query without words
+ */
+export function searchQuestNumbers(
+  index: SearchIndex,
+  query: string,
+): Set<number> | null {
+  const tokens = [...new Set(tokenize(query))];
+  if (tokens.length === 0) {
+    return null;
+  }
+
+  // Intersect the shortest postings first
+  const postings = tokens
+    .map((token) => index.postings[token] ?? [])
+    .sort((a, b) => a.length - b.length);
+  let matches = new Set(decodePostings(postings[0]));
+  for (const deltas of postings.slice(1)) {
+    if (matches.size === 0) break;
+    const questNumbers = new Set(decodePostings(deltas));
+    matches = new Set([...matches].filter((n) => questNumbers.has(n)));
+  }
+  return matches;
+}
+
+/**
+ * Fetches the search index, searching falls back to scanning quests without it.
+ * @param fetch The fetch function to use
+ * @returns SearchIndex | null
+ */
+export async function loadSearchIndex(
+  fetch: typeof globalThis.fetch,
+): Promise<SearchIndex | null> {
+  try {
+    const response = await fetch(`${base}/Quests.search.json`);
+    if (!response.ok) {
+      return null;
+    }
+    const index: SearchIndex = await response.json();
+    return index.version === SEARCH_INDEX_VERSION ? index : null;
+  } catch {
+    return null;
+  }
+}
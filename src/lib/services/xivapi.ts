@@ -1,6 +1,7 @@
 import { base } from "$app/paths";
 
 export const XIVAPI_BETA_BASE_URL = "https://beta.xivapi.com/api/1";
+export const LOCAL_ASSET_PREFIX = "assets/";
 
 const imageUrlCache = new Map<string, string>();
 
@@ -20,6 +21,11 @@ export function getImageUrl(imagePath: string | null): string {
     return placeholderImage;
   }
 
+  // Images bundled by the data pipeline (data/quest_assets.py) are served locally
+  if (imagePath.startsWith(LOCAL_ASSET_PREFIX)) {
+    return `${base}/${imagePath}`;
+  }
+
   // Check cache first
   if (imageUrlCache.has(imagePath)) {
     return imageUrlCache.get(imagePath)!;
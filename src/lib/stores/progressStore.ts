@@ -3,6 +3,8 @@ import {
   quests,
   completedQuests,
   currentExpansion,
+  getCompletedTally,
+  getQuestPositions,
 } from "$lib/stores/questsStore";
 import { openModal } from "$lib/stores/modalManager";
 import { encode, decode } from "@msgpack/msgpack";
@@ -168,28 +170,28 @@ export const groupProgress = writable<
   Record<string, Record<string, QuestGroupProgress>>
 >({});
 
+function toProgress(completed: number, total: number): ExpansionProgress {
+  return {
+    percent: total > 0 ? Math.floor((completed / total) * 100) : 0,
+    completed,
+    total,
+  };
+}
+
 // Calculate progress for a single expansion
 export function calculateExpansionProgress(
   expansionName: string,
 ): ExpansionProgress {
-  const allQuests = get(quests);
-  if (!allQuests.length) return { percent: 0, completed: 0, total: 0 };
-
-  const expansion = allQuests.find((exp) => exp.name === expansionName);
-  if (!expansion) return { percent: 0, completed: 0, total: 0 };
-
-  const questsArray = Object.values(expansion.quests).flat();
-  const totalQuests = questsArray.length;
-  const completedCount = questsArray.filter(
-    (quest) => get(completedQuests)[quest["#"]],
-  ).length;
+  const expansionIndex = get(quests).findIndex(
+    (exp) => exp.name === expansionName,
+  );
+  if (expansionIndex < 0) return { percent: 0, completed: 0, total: 0 };
 
-  return {
-    percent:
-      totalQuests > 0 ? Math.floor((completedCount / totalQuests) * 100) : 0,
-    completed: completedCount,
-    total: totalQuests,
-  };
+  const tally = getCompletedTally();
+  return toProgress(
+    tally.expansions[expansionIndex],
+    getQuestPositions().expansions[expansionIndex][1],
+  );
 }
 
 // Calculate progress for a single quest group within an expansion
@@ -198,28 +200,22 @@ export function calculateQuestGroupProgress(
   questGroup: string,
 ): QuestGroupProgress {
   const allQuests = get(quests);
-  if (!allQuests.length) {
-    return { percent: 0, completed: 0, total: 0 };
-  }
-
-  const expansion = allQuests.find((exp) => exp.name === expansionName);
-  if (!expansion || !expansion.quests[questGroup]) {
+  const expansionIndex = allQuests.findIndex(
+    (exp) => exp.name === expansionName,
+  );
+  const groupIndex =
+    expansionIndex < 0
+      ? -1
+      : Object.keys(allQuests[expansionIndex].quests).indexOf(questGroup);
+  if (groupIndex < 0) {
     return { percent: 0, completed: 0, total: 0 };
   }
 
-  const questsArray = expansion.quests[questGroup];
-  const totalQuests = questsArray.length;
-  const completedCount = questsArray.reduce(
-    (count, quest) => count + (get(completedQuests)[quest["#"]] ? 1 : 0),
-    0,
+  const tally = getCompletedTally();
+  return toProgress(
+    tally.groups[expansionIndex][groupIndex],
+    getQuestPositions().expansions[expansionIndex][2][groupIndex][1],
   );
-
-  return {
-    percent:
-      totalQuests > 0 ? Math.floor((completedCount / totalQuests) * 100) : 0,
-    completed: completedCount,
-    total: totalQuests,
-  };
 }
 
 // Initialize all expansion and quest group progress
@@ -227,22 +223,29 @@ export function initAllExpansionProgress(): void {
   const allQuests = get(quests);
   if (!allQuests.length) return;
 
+  // The tally counts every expansion and group in one pass
+  const tally = getCompletedTally();
+  const positions = getQuestPositions();
   const updatedProgress: Record<string, ExpansionProgress> = {};
   const updatedGroupProgress: Record<
     string,
     Record<string, QuestGroupProgress>
   > = {};
 
-  allQuests.forEach((expansion) => {
-    updatedProgress[expansion.name] = calculateExpansionProgress(
-      expansion.name,
+  allQuests.forEach((expansion, expansionIndex) => {
+    const [, total, groups] = positions.expansions[expansionIndex];
+    updatedProgress[expansion.name] = toProgress(
+      tally.expansions[expansionIndex],
+      total,
     );
 
     updatedGroupProgress[expansion.name] = {};
 
-    Object.keys(expansion.quests).forEach((questGroup) => {
-      updatedGroupProgress[expansion.name][questGroup] =
-        calculateQuestGroupProgress(expansion.name, questGroup);
+    Object.keys(expansion.quests).forEach((questGroup, groupIndex) => {
+      updatedGroupProgress[expansion.name][questGroup] = toProgress(
+        tally.groups[expansionIndex][groupIndex],
+        groups[groupIndex][1],
+      );
     });
   });
 
@@ -1,5 +1,13 @@
-import { writable, get } from "svelte/store";
+import { writable, derived, get } from "svelte/store";
 import type { ExpansionsQuests, Quest } from "$lib/model";
+import {
+  buildQuestPositions,
+  getQuestAt,
+  matchesQuests,
+  tallyCompleted,
+  type CompletedTally,
+  type QuestPositions,
+} from "$lib/questPositions";
 import { initAllExpansionProgress } from "./progressStore";
 
 const LOCAL_STORAGE_KEY = "ffxiv-journey:completed";
@@ -19,6 +27,16 @@ export const completedQuests = writable<Record<number, boolean>>(
 );
 export const isLoadingQuests = writable<boolean>(true);
 export const currentExpansion = writable<string>("");
+export const questPositions = writable<QuestPositions | null>(null);
+
+// Completed quests counted per expansion and group, once per change
+export const completedTally = derived(
+  [questPositions, completedQuests],
+  ([$questPositions, $completedQuests]) =>
+    $questPositions ? tallyCompleted($questPositions, $completedQuests) : null,
+);
+// Kept subscribed so get() reads the last tally instead of counting again
+completedTally.subscribe(() => {});
 
 // Utility to persist completed quests to localStorage
 export function storeCompletedQuests() {
@@ -32,39 +50,54 @@ export function storeCompletedQuests() {
   }
 }
 
-// Helper to get a flat list of all quests
-function getAllQuests(): Quest[] {
-  return get(quests).flatMap((expansion) =>
-    Object.values(expansion.quests).flat(),
+// Use the prebuilt position tables if they match the loaded quests
+export function initQuestPositions(loadedPositions: QuestPositions | null) {
+  const allQuests = get(quests);
+  questPositions.set(
+    loadedPositions && matchesQuests(loadedPositions, allQuests)
+      ? loadedPositions
+      : buildQuestPositions(allQuests),
   );
 }
 
+// Helper to get the position tables, built from the quests if not set yet
+export function getQuestPositions(): QuestPositions {
+  let positions = get(questPositions);
+  if (!positions) {
+    positions = buildQuestPositions(get(quests));
+    if (positions.total) questPositions.set(positions);
+  }
+  return positions;
+}
+
+// Helper to get the tally of the completed quests
+export function getCompletedTally(): CompletedTally {
+  const positions = getQuestPositions();
+  return get(completedTally) ?? tallyCompleted(positions, get(completedQuests));
+}
+
 // Update completion status for a quest and subsequent quests
 export function setQuestCompletion(quest: Quest, isChecked: boolean) {
   const questId = quest["#"];
-  let reachedTarget = false;
+  const { order, positions } = getQuestPositions();
+  const position = positions[questId];
 
   completedQuests.update((current) => {
     const updatedQuests = { ...current };
 
-    getAllQuests().forEach((q) => {
-      if (!reachedTarget) {
-        // For checking: check all quests up to the target quest
-        // For unchecking: leave previous quests unchanged
-        updatedQuests[q["#"]] = isChecked || updatedQuests[q["#"]];
+    if (!position) {
+      updatedQuests[questId] = isChecked;
+    } else if (isChecked) {
+      // For checking: check all quests up to the target quest
+      for (let i = 0; i <= position[3]; i++) {
+        updatedQuests[order[i]] = true;
       }
-
-      if (q["#"] === questId) {
-        reachedTarget = true;
-        // Explicitly set the target quest based on the current action
-        updatedQuests[q["#"]] = isChecked;
-      }
-
-      if (reachedTarget && !isChecked) {
-        // Only uncheck quests from the target onward
-        updatedQuests[q["#"]] = false;
+    } else {
+      // For unchecking: only uncheck quests from the target onward
+      for (let i = position[3]; i < order.length; i++) {
+        updatedQuests[order[i]] = false;
       }
-    });
+    }
 
     return updatedQuests;
   });
@@ -90,17 +123,12 @@ export function setSingleQuestCompletion(quest: Quest, isChecked: boolean) {
 
 // Update the current expansion based on the last completed quest
 export function updateCurrentExpansion() {
-  const completed = get(completedQuests);
-
-  const lastCompletedExpansion = get(quests).reduce<string | null>(
-    (last, expansion) => {
-      const hasCompletedQuest = Object.values(expansion.quests)
-        .flat()
-        .some((quest) => completed[quest["#"]]);
-      return hasCompletedQuest ? expansion.name : last;
-    },
-    null,
-  );
+  const { last } = getCompletedTally();
+  const positions = getQuestPositions();
+  const lastCompletedExpansion =
+    last >= 0
+      ? get(quests)[positions.positions[positions.order[last]][0]]?.name
+      : null;
 
   // Set the current expansion, or clear it if no quests are completed
   currentExpansion.set(lastCompletedExpansion || "");
@@ -108,10 +136,6 @@ export function updateCurrentExpansion() {
 
 // Get the last checked quest
 export function getLastCheckedQuest(): Quest | null {
-  const completed = get(completedQuests);
-
-  return getAllQuests().reduce<Quest | null>(
-    (lastChecked, quest) => (completed[quest["#"]] ? quest : lastChecked),
-    null,
-  );
+  const { last } = getCompletedTally();
+  return last >= 0 ? getQuestAt(get(quests), getQuestPositions(), last) : null;
 }
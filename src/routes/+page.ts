@@ -4,13 +4,72 @@ export const prerender = true;
 
 import { base } from "$app/paths";
 import type { ExpansionsQuests } from "$lib/model.js";
-export async function load({ fetch }): Promise<{ quests: ExpansionsQuests }> {
+import {
+  expandCompactQuests,
+  getExpansionNames,
+  getPreferredLocale,
+  loadLocalizedStrings,
+  localizeCompactQuests,
+  type CompactQuests,
+} from "$lib/compactQuests";
+import { loadSearchIndex, type SearchIndex } from "$lib/searchIndex";
+import { loadQuestPositions, type QuestPositions } from "$lib/questPositions";
+export async function load({ fetch }): Promise<{
+  quests: ExpansionsQuests;
+  expansionNames: string[];
+  searchIndex: SearchIndex | null;
+  positions: QuestPositions | null;
+}> {
+  const [{ quests, expansionNames, localized }, searchIndex, positions] =
+    await Promise.all([
+      loadQuests(fetch, getPreferredLocale()),
+      loadSearchIndex(fetch),
+      loadQuestPositions(fetch),
+    ]);
+  return {
+    quests,
+    // English expansion names by index, assets such as backgrounds are named after them
+    expansionNames,
+    // The search index only covers English, localized quests are scanned
+    searchIndex: localized ? null : searchIndex,
+    // Positions do not depend on the language
+    positions,
+  };
+}
+
+async function loadQuests(
+  fetch: typeof globalThis.fetch,
+  locale: string | null,
+): Promise<{
+  quests: ExpansionsQuests;
+  expansionNames: string[];
+  localized: boolean;
+}> {
+  // The compact artifact is about a quarter of the size, Quests.json is the fallback
+  const [compactResponse, localizedStrings] = await Promise.all([
+    fetch(`${base}/Quests.compact.json`),
+    locale ? loadLocalizedStrings(fetch, locale) : null,
+  ]);
+  if (compactResponse.ok) {
+    const compact: CompactQuests = await compactResponse.json();
+    const localizedCompact = localizedStrings
+      ? localizeCompactQuests(compact, localizedStrings)
+      : compact;
+    return {
+      quests: expandCompactQuests(localizedCompact),
+      expansionNames: getExpansionNames(compact),
+      localized: localizedCompact !== compact,
+    };
+  }
+
   const response = await fetch(`${base}/Quests.json`);
   if (!response.ok) {
     throw new Error("Failed to fetch quests");
   }
-  const data = await response.json();
+  const quests: ExpansionsQuests = await response.json();
   return {
-    quests: data,
+    quests,
+    expansionNames: quests.map((expansion) => expansion.name),
+    localized: false,
   };
 }